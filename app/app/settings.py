@@ -15,7 +15,8 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 from pathlib import Path
 import os
 import datetime
-from decouple import config
+import tempfile
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -63,8 +64,8 @@ SWAGGER_SETTINGS = {
     }
 }
 
-# Use nose to run all tests
-TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
+# Use nose to run all tests, slowest queries are listed at the end
+TEST_RUNNER = 'core.test_runner.SlowQueryNoseTestSuiteRunner'
 
 NOSE_ARGS = [
     '--with-coverage',
@@ -72,15 +73,68 @@ NOSE_ARGS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.StaticFilesMiddleware",
+    "core.middleware.ServerTimingMiddleware",
+    "core.middleware.SlowQueryMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.middleware.LeanSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
-    "django.contrib.messages.middleware.MessageMiddleware",
+    "core.middleware.LeanCsrfViewMiddleware",
+    "core.middleware.LeanAuthenticationMiddleware",
+    "core.middleware.LeanMessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# responses smaller than this are not compressed, and compressed bodies
+# of this many responses with an ETag are cached, see core.compression
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CACHE_SIZE = 256
+
+# the API authenticates by JWT only, so the session, CSRF, auth and
+# messages middleware skip requests under these prefixes, see
+# core.middleware.PathSkipMixin. The admin keeps the full stack.
+LEAN_MIDDLEWARE_PATHS = ['/api/']
+
+# Server-Timing header and a JSON log line per request, see core.timing
+SERVER_TIMING = config('SERVER_TIMING', default=False, cast=bool)
+
+# Prometheus metrics served at /metrics, see core.metrics. Every worker
+# process writes its numbers to METRICS_DIR, at most once per interval,
+# and files of processes that exited are removed by the next scrape
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config(
+    'METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'app-metrics')
+)
+METRICS_FLUSH_INTERVAL = 1.0
+# /metrics answers 404 unless the client address is listed here or it
+# sends "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=Csv())
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# queries slower than the threshold are recorded with the issuing view
+# and, for SELECTs on Postgres, their EXPLAIN (ANALYZE, BUFFERS) plan.
+# Report them with `manage.py slowqueries`, see core.slowqueries
+SLOW_QUERY_ENABLED = config('SLOW_QUERY_ENABLED', default=False, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=float)
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default='')
+# query parameters carry password hashes and refresh tokens, they are
+# only recorded when turned on, for debugging
+SLOW_QUERY_LOG_PARAMS = config('SLOW_QUERY_LOG_PARAMS', default=False, cast=bool)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 ROOT_URLCONF = "app.urls"
 
 TEMPLATES = [
@@ -103,16 +157,53 @@ WSGI_APPLICATION = "app.wsgi.application"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        )
-
+        'core.authentication.CachedJWTAuthentication',
+        ),
+    # the core JSON classes use orjson when it is installed, swap them for
+    # rest_framework.renderers.JSONRenderer / parsers.JSONParser to opt out
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        ),
+    # proxies in front of the app, the client IP used for throttling is
+    # taken from X-Forwarded-For that many hops back. With 0 the header
+    # is ignored, clients could pick any address with it.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+    # token bucket rates for user.throttling, named <throttle_scope>_<kind>
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '5/min',
+        'register_ip': '10/min',
+        'register_email': '3/min',
+        'password_reset_ip': '10/min',
+        'password_reset_email': '3/hour',
+    },
 }
 
+# 'local' keeps buckets in process memory, 'cache' shares them between
+# nodes through the USER_THROTTLE_CACHE_ALIAS cache
+USER_THROTTLE_ENABLED = config('USER_THROTTLE_ENABLED', default=True, cast=bool)
+USER_THROTTLE_BACKEND = config('USER_THROTTLE_BACKEND', default='local')
+USER_THROTTLE_CACHE_ALIAS = 'default'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': datetime.timedelta(minutes=10),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=1),
+    # user.views.TokenRotateView rotates refresh tokens within a family
+    # (core.tokens), which replaces blacklisting of rotated tokens
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': False,
     }
 
+# validated access tokens kept per process by
+# core.authentication.CachedJWTAuthentication until they expire
+ACCESS_TOKEN_CACHE_SIZE = 10000
+
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
@@ -123,9 +214,75 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds a connection is reused across requests, 0 closes it
+        # after every request. DB_PREPARED_STATEMENTS needs it above 0.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
     }
 }
 
+# read replicas, DB_REPLICA_HOSTS=host[,host] adds a replica_<n> alias per
+# host with the credentials of the primary. Safe requests to views with
+# ``replica_safe = True`` read from them, see core.db_routers
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='')
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, DB_REPLICA_HOSTS.split(',')), 1):
+    alias = 'replica_{}'.format(number)
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+# how long a client reads from the primary after a write. API clients
+# are pinned through the cache, which must be shared between workers
+# (CACHE_LOCATION) for them to read their own writes, see core.W002
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# PREPARE the user and blacklist lookups of authentication on first use
+# on each persistent Postgres connection, see core.prepared. Ignored while
+# CONN_MAX_AGE is 0. Leave off behind a pooler in transaction mode,
+# prepared statements belong to server connections.
+DB_PREPARED_STATEMENTS = config('DB_PREPARED_STATEMENTS', default=False, cast=bool)
+
+# open database connections and fill lazy caches when the WSGI
+# application is loaded, see core.warmup.warm_up_process. Works with
+# gunicorn with or without --preload and uWSGI with or without lazy-apps,
+# a preforking master closes its connections before forking and every
+# worker opens its own. Servers forking without os.fork() hooks firing
+# must run core.warmup.warm_up() from their own post-fork hook instead.
+WARM_UP_WORKERS = config('WARM_UP_WORKERS', default=False, cast=bool)
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+# local memory by default, set CACHE_LOCATION (host:port[,host:port]) to
+# share the cache between processes and nodes through memcached.
+# Local memory is private to each worker process, so with several workers
+# refresh token family states, replica pins of API clients and the
+# 'cache' throttle backend only hold within one process.
+CACHE_LOCATION = config('CACHE_LOCATION', default='')
+
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION.split(','),
+            'KEY_PREFIX': 'app',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# how long a serialized user profile is kept in the cache, in seconds
+PROFILE_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -164,12 +321,40 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = "/static/"
+STATIC_ROOT = config('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
+
+# collectstatic writes hashed names, a manifest and compressed variants
+# that core.middleware.StaticFilesMiddleware serves
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 
 
 AUTH_USER_MODEL = "core.User"
 
+# users accepted by one bulk registration call, and threads hashing
+# their passwords
+USER_BULK_REGISTER_LIMIT = 100
+USER_BULK_REGISTER_HASH_WORKERS = 4
+
+# rows deleted per statement by `manage.py purge_users`, see core.deletion
+USER_DELETION_BATCH_SIZE = 1000
+
+
+
+# how long a consumed email verification token is remembered, in seconds
+EMAIL_VERIFY_CACHE_TIMEOUT = 300
+
+# scheme and domain for links in emails, e.g. https://trainingapp.com,
+# taken from the request when empty
+EMAIL_BASE_URL = config('EMAIL_BASE_URL', default='')
 
+# send emails that are not needed for the response from background threads
+EMAIL_ASYNC = config('EMAIL_ASYNC', default=True, cast=bool)
+EMAIL_ASYNC_WORKERS = 2
 
+EMAIL_BACKEND = config(
+    'EMAIL_BACKEND',
+    default='django.core.mail.backends.smtp.EmailBackend'
+)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
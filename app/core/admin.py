@@ -2,14 +2,60 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 # if you want to extend your code in the fututre, to support multiple languages
-from django.utils.translation import gettext as _
+from django.utils.translation import gettext as _, ngettext
 
 from core import models
+from core.deletion import request_deletion
+from user.emails import resend_email_verify
+
+
+def activate_users(modeladmin, request, queryset):
+    count = queryset.activate()
+    modeladmin.message_user(request, ngettext(
+        '%(count)d user was activated.', '%(count)d users were activated.', count
+    ) % {'count': count})
+
+
+def deactivate_users(modeladmin, request, queryset):
+    count = queryset.deactivate()
+    modeladmin.message_user(request, ngettext(
+        '%(count)d user was deactivated.', '%(count)d users were deactivated.', count
+    ) % {'count': count})
+
+
+def verify_users(modeladmin, request, queryset):
+    count = queryset.verify()
+    modeladmin.message_user(request, ngettext(
+        '%(count)d user was verified.', '%(count)d users were verified.', count
+    ) % {'count': count})
+
+
+def resend_verification(modeladmin, request, queryset):
+    count = resend_email_verify(queryset, request)
+    modeladmin.message_user(request, ngettext(
+        'Verification email was queued for %(count)d user.',
+        'Verification emails were queued for %(count)d users.',
+        count
+    ) % {'count': count})
+
+
+# every action is a single UPDATE of the selected users, see UserQuerySet
+activate_users.short_description = _('Activate selected users')
+deactivate_users.short_description = _('Deactivate selected users')
+verify_users.short_description = _('Mark selected users as verified')
+resend_verification.short_description = _('Resend verification email')
+# view-only staff must not change users or send them emails
+activate_users.allowed_permissions = ('change', )
+deactivate_users.allowed_permissions = ('change', )
+verify_users.allowed_permissions = ('change', )
+resend_verification.allowed_permissions = ('change', )
 
 
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']
-    list_display = ['email', 'name']
+    list_display = ['email', 'name', 'is_active', 'is_verified']
+    list_filter = ['is_active', 'is_verified', 'is_staff', 'deletion_requested_at']
+    actions = [activate_users, deactivate_users, verify_users, resend_verification]
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('name', )}),
@@ -17,8 +63,9 @@ class UserAdmin(BaseUserAdmin):
             _('Permissons'),
             {'fields': ('is_active', 'is_staff', 'is_superuser', 'is_verified')}
         ),
-        (_('Important dates'), {'fields': ('last_login', )})
+        (_('Important dates'), {'fields': ('last_login', 'deletion_requested_at')})
     )
+    readonly_fields = ('deletion_requested_at', )
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
@@ -26,5 +73,30 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def get_deleted_objects(self, objs, request):
+        """
+        Dependent rows are not deleted here, so the confirmation page
+        lists the users only instead of collecting all their tokens
+        """
+        objs = list(objs)
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        """
+        Only mark the user, the purge_users command deletes it in batches
+        """
+        request_deletion(models.User.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        request_deletion(queryset)
+
 
 admin.site.register(models.User, UserAdmin)
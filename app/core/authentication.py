@@ -0,0 +1,117 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core import prepared
+
+
+class TokenCache:
+    """
+    Bounded LRU of validated access tokens keyed by the digest of the
+    raw token, an entry is dropped once the token expires. Tokens are
+    indexed by user so all tokens of a user can be evicted at once.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.by_user = {}
+        self.lock = threading.Lock()
+
+    def get(self, digest, now):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            token, expires_at, user_id = entry
+            if expires_at <= now:
+                self._remove(digest)
+                return None
+            self.entries.move_to_end(digest)
+            return token
+
+    def set(self, digest, token, expires_at, user_id):
+        if not self.max_entries:
+            return
+        with self.lock:
+            if digest in self.entries:
+                self._remove(digest)
+            self.entries[digest] = (token, expires_at, user_id)
+            self.by_user.setdefault(user_id, set()).add(digest)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def evict_user(self, user_id):
+        with self.lock:
+            for digest in list(self.by_user.get(user_id, ())):
+                self._remove(digest)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+
+    def _remove(self, digest):
+        _, _, user_id = self.entries.pop(digest)
+        digests = self.by_user.get(user_id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self.by_user[user_id]
+
+
+token_cache = TokenCache(settings.ACCESS_TOKEN_CACHE_SIZE)
+
+
+def evict_user(user_id):
+    """
+    Forget cached tokens of the user in this process. Other processes
+    still reject the user, authentication loads it on every request.
+    """
+    token_cache.evict_user(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication verifying the signature of an access token once
+    and reusing its decoded claims until it expires, the user is loaded
+    by a prepared statement when DB_PREPARED_STATEMENTS is on
+    """
+
+    def get_validated_token(self, raw_token):
+        digest = hashlib.sha256(raw_token).digest()
+        token = token_cache.get(digest, time.time())
+        if token is not None:
+            return token
+
+        token = super().get_validated_token(raw_token)
+        expires_at = token.get('exp')
+        if expires_at is not None:
+            token_cache.set(
+                digest, token, expires_at, token.get(api_settings.USER_ID_CLAIM)
+            )
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        try:
+            user = prepared.get_user(api_settings.USER_ID_FIELD, user_id)
+        except get_user_model().DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user
@@ -0,0 +1,86 @@
+import statistics
+import time
+
+from django.utils.module_loading import autodiscover_modules
+
+
+# name -> setup function, filled in by the ``benchmarks`` module of each app
+registry = {}
+
+
+def register(name):
+    """
+    Register a benchmark case under ``name``.
+
+    The decorated function is the setup: it runs once, outside the timed
+    section, and returns the callable that is being measured, or None
+    to skip the case, e.g. on a database it does not apply to.
+    """
+    def decorator(setup):
+        registry[name] = setup
+        return setup
+    return decorator
+
+
+def autodiscover():
+    """ Import ``benchmarks`` modules of all installed apps """
+    autodiscover_modules('benchmarks')
+
+
+def autorange(func, min_time=0.02):
+    """
+    Return how many calls of func are needed for one sample to take
+    at least min_time seconds, so fast cases are not lost in timer noise
+    """
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started >= min_time:
+            return number
+        number *= 10
+
+
+def measure(func, repeat=7, warmup=2, min_time=0.02):
+    """
+    Time func and return per-call statistics in seconds
+    """
+    number = autorange(func, min_time)
+    for _ in range(warmup):
+        for _ in range(number):
+            func()
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.mean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'max': max(samples),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare medians with a stored baseline and return the regressions
+    as (name, baseline median, current median, relative change) tuples
+    """
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median']
+        after = stats['median']
+        change = (after - before) / before if before else 0.0
+        if change > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
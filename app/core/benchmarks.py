@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.client import ClientHandler
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core import prepared
+from core.authentication import CachedJWTAuthentication
+from core.benchmark import register
+
+
+# cases run inside a transaction that the benchmark command rolls back,
+# so they are free to write to the database
+
+
+def profile_request(lean_paths):
+    """
+    Handler with the configured middleware and LEAN_MIDDLEWARE_PATHS,
+    and an authenticated GET of the user profile
+    """
+    user = get_user_model().objects.create_user(
+        email='bench-middleware-{}@example.com'.format(len(lean_paths)),
+        password='benchpass123',
+        is_verified=True,
+    )
+    access = user.tokens()['access']
+    with override_settings(LEAN_MIDDLEWARE_PATHS=lean_paths):
+        handler = ClientHandler()
+        handler.load_middleware()
+    environ = RequestFactory().get(
+        '/api/user/update/', HTTP_AUTHORIZATION='Bearer ' + access
+    ).environ
+
+    def run():
+        response = handler(dict(environ))
+        assert response.status_code == 200, response.status_code
+    return run
+
+
+@register('core.middleware.full')
+def middleware_full():
+    return profile_request([])
+
+
+@register('core.middleware.lean')
+def middleware_lean():
+    return profile_request(['/api/'])
+
+
+def raw_access_token():
+    user = get_user_model().objects.create_user(
+        email='bench-auth@example.com', password='benchpass123'
+    )
+    return user.tokens()['access'].encode()
+
+
+@register('core.auth.validate.jwt')
+def validate_jwt():
+    raw_token = raw_access_token()
+    authentication = JWTAuthentication()
+
+    def run():
+        authentication.get_validated_token(raw_token)
+    return run
+
+
+@register('core.auth.validate.cached')
+def validate_cached():
+    raw_token = raw_access_token()
+    authentication = CachedJWTAuthentication()
+
+    def run():
+        authentication.get_validated_token(raw_token)
+    return run
+
+
+def prepared_lookups():
+    """
+    The user and blacklist lookups of authentication with their
+    statements prepared on the connection, None when not on Postgres.
+    The prepared cases run the statements directly, get_user() and
+    is_blacklisted() would need DB_PREPARED_STATEMENTS and CONN_MAX_AGE.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    for name in prepared.STATEMENTS:
+        prepared.prepare(connection, name)
+    return get_user_model().objects.create_user(
+        email='bench-prepared@example.com', password='benchpass123'
+    )
+
+
+@register('core.db.user_by_id.orm')
+def user_by_id_orm():
+    user = prepared_lookups()
+    if user is None:
+        return None
+    return lambda: get_user_model().objects.get(id=user.pk)
+
+
+@register('core.db.user_by_id.prepared')
+def user_by_id_prepared():
+    user = prepared_lookups()
+    if user is None:
+        return None
+    return lambda: prepared.user_from_row(
+        connection.alias, prepared.run(connection, 'user_by_id', user.pk)
+    )
+
+
+@register('core.db.user_by_email.orm')
+def user_by_email_orm():
+    user = prepared_lookups()
+    if user is None:
+        return None
+    return lambda: get_user_model().objects.get(email=user.email)
+
+
+@register('core.db.user_by_email.prepared')
+def user_by_email_prepared():
+    user = prepared_lookups()
+    if user is None:
+        return None
+    return lambda: prepared.user_from_row(
+        connection.alias, prepared.run(connection, 'user_by_email', user.email)
+    )
+
+
+@register('core.db.blacklist.orm')
+def blacklist_orm():
+    if prepared_lookups() is None:
+        return None
+    return lambda: BlacklistedToken.objects.filter(token__jti='bench-jti').exists()
+
+
+@register('core.db.blacklist.prepared')
+def blacklist_prepared():
+    if prepared_lookups() is None:
+        return None
+    return lambda: prepared.run(connection, 'blacklisted_jti', 'bench-jti') is not None
@@ -0,0 +1,17 @@
+from django.core.cache import cache
+from django.db import transaction
+
+
+def profile_cache_key(user_id):
+    """ Cache key of the serialized profile of the user """
+    return 'user-profile:{}'.format(user_id)
+
+
+def invalidate_profiles(user_ids):
+    """
+    Drop cached profiles of the users, in one cache call for a batch,
+    once the transaction commits. Dropped earlier, a concurrent request
+    would cache the old profile again before the change is visible.
+    """
+    keys = [profile_cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
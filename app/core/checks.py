@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_prepared_statements(app_configs, **kwargs):
+    """
+    Prepared statements pay off only on connections reused across requests
+    """
+    if not settings.DB_PREPARED_STATEMENTS:
+        return []
+    return [
+        Warning(
+            'DB_PREPARED_STATEMENTS is on but CONN_MAX_AGE of database '
+            '"{}" is 0, no statement is prepared on it.'.format(alias),
+            hint='Set DB_CONN_MAX_AGE to keep connections open between requests.',
+            id='core.W001',
+        )
+        for alias, database in settings.DATABASES.items()
+        if database.get('CONN_MAX_AGE', 0) == 0
+    ]
+
+
+@register()
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    API clients are pinned to the primary after a write through the cache,
+    the pin must be seen by every worker
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.DATABASE_REPLICAS or not backend.endswith('LocMemCache'):
+        return []
+    return [
+        Warning(
+            'DATABASE_REPLICAS is set but the default cache is local memory, '
+            'API clients may not read their own writes on other workers.',
+            hint='Set CACHE_LOCATION to share the cache between workers.',
+            id='core.W002',
+        )
+    ]
@@ -0,0 +1,65 @@
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+
+
+# True while a replica-safe view handles a safe request, set by
+# ReplicaRoutingMiddleware
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def use_replica(enabled=True):
+    return _use_replica.set(enabled)
+
+
+def reset(token):
+    _use_replica.reset(token)
+
+
+def replica_safe(view):
+    """
+    Mark a function view as safe to read from replicas. Class based
+    views set ``replica_safe = True`` instead.
+    """
+    view.replica_safe = True
+    return view
+
+
+def is_replica_safe(view_func):
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    return getattr(view_class or view_func, 'replica_safe', False)
+
+
+def pin_key(request):
+    """
+    Cache key pinning the client to the primary, from its Authorization
+    header, for API clients that do not keep cookies
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return 'db-pin:' + hashlib.sha256(authorization.encode()).hexdigest()
+
+
+class ReplicaRouter:
+    """
+    Sends reads of replica-safe views to a random replica from
+    DATABASE_REPLICAS, every other query goes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,90 @@
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from core.authentication import evict_user
+from core.cache import invalidate_profiles
+from core.models import RefreshTokenFamily
+from core.tokens import REVOKED, cache_family_state
+
+
+def request_deletion(users):
+    """
+    Deactivate the users and revoke their refresh tokens right away,
+    their rows are removed later by purge(). Return how many users
+    were marked.
+    """
+    ids = list(
+        users.filter(deletion_requested_at__isnull=True).values_list('pk', flat=True)
+    )
+    if not ids:
+        return 0
+
+    now = timezone.now()
+    count = get_user_model().objects.filter(pk__in=ids).update(
+        is_active=False, deletion_requested_at=now, updated_at=now
+    )
+    families = RefreshTokenFamily.objects.filter(user_id__in=ids)
+    for family_id in families.filter(revoked=False).values_list('pk', flat=True):
+        cache_family_state(family_id, REVOKED)
+    families.update(revoked=True)
+    invalidate_profiles(ids)
+    for user_id in ids:
+        evict_user(user_id)
+    return count
+
+
+def dependent_querysets(user_ids):
+    """
+    Rows referencing the users, in the order they are deleted so no
+    delete has to cascade
+    """
+    User = get_user_model()
+    return [
+        BlacklistedToken.objects.filter(token__user_id__in=user_ids),
+        OutstandingToken.objects.filter(user_id__in=user_ids),
+        LogEntry.objects.filter(user_id__in=user_ids),
+        User.groups.through.objects.filter(user_id__in=user_ids),
+        User.user_permissions.through.objects.filter(user_id__in=user_ids),
+        RefreshTokenFamily.objects.filter(user_id__in=user_ids),
+    ]
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    Delete the rows batch_size at a time, every batch is a short
+    transaction of its own. Yield the number deleted so far.
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        deleted += queryset.model._base_manager.filter(pk__in=ids).delete()[0]
+        yield deleted
+
+
+def purge(batch_size=1000, limit=None):
+    """
+    Remove users marked by request_deletion() with their dependent rows.
+    Yield (model label, number deleted so far) after every batch.
+    """
+    pending = get_user_model().objects.filter(
+        deletion_requested_at__isnull=False
+    ).order_by('deletion_requested_at', 'pk')
+    user_ids = list(pending.values_list('pk', flat=True)[:limit])
+
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        for queryset in dependent_querysets(chunk):
+            for deleted in delete_in_batches(queryset, batch_size):
+                yield queryset.model._meta.label, deleted
+
+        # nothing references the users any more, so nothing cascades
+        users = get_user_model().objects.filter(pk__in=chunk)
+        for deleted in delete_in_batches(users, batch_size):
+            yield get_user_model()._meta.label, deleted
@@ -0,0 +1,98 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Django command to run the registered microbenchmarks
+    """
+    help = (
+        'Times the benchmark cases registered in <app>/benchmarks.py and '
+        'optionally compares them with a stored JSON baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cases', nargs='*',
+            help='Only run cases whose name starts with one of these prefixes.'
+        )
+        parser.add_argument('--repeat', type=int, default=7)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--min-time', type=float, default=0.02,
+            help='Minimal duration of one sample in seconds.'
+        )
+        parser.add_argument('--output', help='Write results as JSON to this file.')
+        parser.add_argument('--baseline', help='JSON file from a previous --output.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='Allowed slowdown of the median against the baseline (0.1 = 10%%).'
+        )
+
+    def handle(self, *args, **options):
+        benchmark.autodiscover()
+        names = sorted(
+            name for name in benchmark.registry
+            if not options['cases']
+            or any(name.startswith(prefix) for prefix in options['cases'])
+        )
+        if not names:
+            raise CommandError('No benchmark cases matched.')
+
+        results = {}
+        for name in names:
+            # every case writes its fixtures inside a transaction
+            # that is rolled back, so the database stays untouched,
+            # and may send requests through django.test.client
+            with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']
+            ):
+                func = benchmark.registry[name]()
+                if func is not None:
+                    results[name] = benchmark.measure(
+                        func,
+                        repeat=options['repeat'],
+                        warmup=options['warmup'],
+                        min_time=options['min_time'],
+                    )
+                transaction.set_rollback(True)
+            if name in results:
+                self.write_result(name, results[name])
+            else:
+                self.stdout.write('{:<36} skipped'.format(name))
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = benchmark.compare(
+                    results, json.load(baseline), options['threshold']
+                )
+            for name, before, after, change in regressions:
+                self.stdout.write(self.style.ERROR(
+                    '{}: {:.1f}us -> {:.1f}us (+{:.0%})'.format(
+                        name, before * 1e6, after * 1e6, change
+                    )
+                ))
+            if regressions:
+                raise CommandError(
+                    '{} benchmark(s) regressed'.format(len(regressions))
+                )
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def write_result(self, name, stats):
+        self.stdout.write(
+            '{:<36} median {:>11.1f}us  min {:>11.1f}us  '
+            'stdev {:>9.1f}us  ({} x {})'.format(
+                name, stats['median'] * 1e6, stats['min'] * 1e6,
+                stats['stdev'] * 1e6, stats['repeat'], stats['number']
+            )
+        )
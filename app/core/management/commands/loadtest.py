@@ -0,0 +1,297 @@
+import json
+import math
+import re
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request as urllib_request
+from urllib.error import HTTPError
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+# endpoints are reported in the order the flow calls them
+FLOW = (
+    'user:register',
+    'user:email-verify',
+    'user:login',
+    'user:token_refresh',
+    'user:update',
+    'user:logout',
+)
+
+TOKEN_RE = re.compile(r'token=([\w\-.]+)')
+
+
+def percentile(values, percent):
+    """
+    Return the nearest-rank percentile of already sorted values
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100.0 * len(values)) - 1, 0)
+    return values[rank]
+
+
+class InProcessTransport:
+    """
+    Sends requests through the test client, one client per virtual user
+    """
+
+    def __init__(self):
+        self.client = APIClient()
+
+    def call(self, method, path, data=None, token=None, query=None):
+        headers = {}
+        if token:
+            headers['HTTP_AUTHORIZATION'] = 'Bearer ' + token
+        if query:
+            path = path + '?' + query
+        res = getattr(self.client, method)(path, data, format='json', **headers)
+        try:
+            body = json.loads(res.content or b'{}')
+        except ValueError:
+            body = {}
+        return res.status_code, body
+
+    def verification_token(self, email):
+        """ Pick the token out of the mail sent by the locmem backend """
+        for message in reversed(mail.outbox):
+            if email in message.to:
+                match = TOKEN_RE.search(message.body)
+                if match:
+                    return match.group(1)
+        return None
+
+
+class HTTPTransport:
+    """
+    Sends requests to a live server over HTTP
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def call(self, method, path, data=None, token=None, query=None):
+        url = self.base_url + path
+        if query:
+            url = url + '?' + query
+        payload = json.dumps(data).encode() if data is not None else None
+        req = urllib_request.Request(url, data=payload, method=method.upper())
+        req.add_header('Content-Type', 'application/json')
+        if token:
+            req.add_header('Authorization', 'Bearer ' + token)
+        try:
+            with urllib_request.urlopen(req) as res:
+                status, content = res.status, res.read()
+        except HTTPError as error:
+            status, content = error.code, error.read()
+        try:
+            body = json.loads(content or b'{}')
+        except ValueError:
+            body = {}
+        return status, body
+
+    def verification_token(self, email):
+        """
+        The live server keeps its own outbox, so mint an equivalent token
+        from the shared database and SECRET_KEY instead
+        """
+        user = get_user_model().objects.filter(email=email).first()
+        if user is None:
+            return None
+        return str(RefreshToken.for_user(user).access_token)
+
+
+class Command(BaseCommand):
+    """
+    Django command to drive the user API auth flows under load
+    """
+    help = (
+        'Runs register -> verify -> login -> refresh -> update -> logout '
+        'for a number of virtual users and reports latency percentiles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Base URL of a live server, e.g. http://localhost:8000. '
+                 'Requests go through the test client when omitted.'
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Number of virtual users, each runs the whole flow once.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Number of virtual users running at the same time.'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the report as JSON.'
+        )
+        parser.add_argument(
+            '--throttle', action='store_true',
+            help='Keep the auth rate limits in-process. A live server has '
+                 'to be started with USER_THROTTLE_ENABLED=False instead.'
+        )
+        parser.add_argument(
+            '--keep-users', action='store_true',
+            help='Do not delete the users created by the run.'
+        )
+
+    def handle(self, *args, **options):
+        self.base_url = options['url']
+        self.run_id = uuid.uuid4().hex[:8]
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+        overrides = {}
+        if not self.base_url:
+            # no outside services: capture mail in memory and accept
+            # the host name used by the test client
+            overrides = {
+                'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+                'EMAIL_ASYNC': False,
+                'ALLOWED_HOSTS': ['testserver'],
+            }
+            if not options['throttle']:
+                # every virtual user shares one IP address
+                overrides['USER_THROTTLE_ENABLED'] = False
+
+        emails = [
+            'loadtest-{}-{}@example.com'.format(self.run_id, number)
+            for number in range(options['users'])
+        ]
+        with override_settings(**overrides):
+            started = time.perf_counter()
+            if options['concurrency'] > 1:
+                with ThreadPoolExecutor(options['concurrency']) as pool:
+                    list(pool.map(self.run_flow, emails))
+            else:
+                for email in emails:
+                    self.run_flow(email)
+            elapsed = time.perf_counter() - started
+
+        if not options['keep_users']:
+            get_user_model().objects.filter(email__in=emails).delete()
+
+        report = self.build_report(elapsed)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_report(report)
+
+    def make_transport(self):
+        if self.base_url:
+            return HTTPTransport(self.base_url)
+        return InProcessTransport()
+
+    def timed_call(self, transport, name, method, data=None, token=None, query=None):
+        """ Call the endpoint by url name and record its latency """
+        started = time.perf_counter()
+        status, body = transport.call(
+            method, reverse(name), data=data, token=token, query=query
+        )
+        self.timings[name].append(time.perf_counter() - started)
+        if status >= 400:
+            self.errors[name] += 1
+            return None
+        return body
+
+    def run_flow(self, email):
+        """
+        Run the whole auth flow for one virtual user, stopping at the
+        first failed step
+        """
+        transport = self.make_transport()
+        password = 'loadtest-' + self.run_id
+        credentials = {'email': email, 'password': password}
+
+        body = self.timed_call(
+            transport, 'user:register', 'post',
+            dict(credentials, name='Load test')
+        )
+        if body is None:
+            return
+
+        token = transport.verification_token(email)
+        if token is None:
+            self.errors['user:email-verify'] += 1
+            return
+        body = self.timed_call(
+            transport, 'user:email-verify', 'get', query='token=' + token
+        )
+        if body is None:
+            return
+
+        body = self.timed_call(transport, 'user:login', 'post', credentials)
+        if body is None:
+            return
+        tokens = body['tokens']
+
+        body = self.timed_call(
+            transport, 'user:token_refresh', 'post',
+            {'refresh': tokens['refresh']}
+        )
+        if body is None:
+            return
+        access = body.get('access', tokens['access'])
+        refresh = body.get('refresh', tokens['refresh'])
+
+        body = self.timed_call(
+            transport, 'user:update', 'patch',
+            {'email': email, 'name': 'Load test updated'}, token=access
+        )
+        if body is None:
+            return
+
+        self.timed_call(
+            transport, 'user:logout', 'post', {'refresh': refresh}, token=access
+        )
+
+    def build_report(self, elapsed):
+        endpoints = []
+        for name in FLOW:
+            values = sorted(self.timings.get(name, []))
+            endpoints.append({
+                'endpoint': name,
+                'requests': len(values),
+                'errors': self.errors.get(name, 0),
+                'throughput': len(values) / elapsed if elapsed else 0.0,
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            })
+        total = sum(item['requests'] for item in endpoints)
+        return {
+            'mode': 'live' if self.base_url else 'in-process',
+            'elapsed_s': elapsed,
+            'requests': total,
+            'throughput': total / elapsed if elapsed else 0.0,
+            'endpoints': endpoints,
+        }
+
+    def write_report(self, report):
+        self.stdout.write('{} requests in {:.2f}s ({:.1f} req/s, {})'.format(
+            report['requests'], report['elapsed_s'],
+            report['throughput'], report['mode']
+        ))
+        header = '{:<20} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}'
+        row = '{:<20} {:>8} {:>7} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f}'
+        self.stdout.write(header.format(
+            'endpoint', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'
+        ))
+        for item in report['endpoints']:
+            self.stdout.write(row.format(
+                item['endpoint'], item['requests'], item['errors'],
+                item['throughput'], item['p50_ms'],
+                item['p95_ms'], item['p99_ms']
+            ))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core import deletion
+
+
+class Command(BaseCommand):
+    """
+    Django command to delete users whose deletion was requested
+    """
+    help = (
+        'Deletes users marked for deletion together with their tokens, '
+        'admin log entries and permissions, in short batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.USER_DELETION_BATCH_SIZE,
+            help='Rows deleted per statement, and users handled per round.'
+        )
+        parser.add_argument('--limit', type=int, help='Delete at most this many users.')
+
+    def handle(self, *args, **options):
+        totals = {}
+        for label, deleted in deletion.purge(options['batch_size'], options['limit']):
+            totals[label] = deleted
+            self.stdout.write('{}: {} deleted'.format(label, deleted))
+
+        users = totals.get(get_user_model()._meta.label, 0)
+        self.stdout.write(self.style.SUCCESS('Purged {} users'.format(users)))
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import slowqueries
+
+
+class Command(BaseCommand):
+    """
+    Django command to report slow queries captured in SLOW_QUERY_LOG
+    """
+    help = (
+        'Groups slow queries from the log by SQL, slowest total time first, '
+        'with the views that issued them and their EXPLAIN plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Log file to read, SLOW_QUERY_LOG by default.'
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--view', help='Only queries issued by this URL name.')
+        parser.add_argument('--plans', action='store_true', help='Print EXPLAIN plans.')
+        parser.add_argument('--clear', action='store_true', help='Empty the log after reporting.')
+
+    def handle(self, *args, **options):
+        path = options['log']
+        if not path:
+            raise CommandError('Set SLOW_QUERY_LOG or pass --log.')
+        if not os.path.exists(path):
+            self.stdout.write('No slow queries recorded.')
+            return
+
+        entries = slowqueries.load(path)
+        if options['view']:
+            entries = [entry for entry in entries if entry['view'] == options['view']]
+        if not entries:
+            self.stdout.write('No slow queries recorded.')
+        else:
+            groups = slowqueries.summarize(entries)
+            self.stdout.write('{} slow queries, {} distinct'.format(len(entries), len(groups)))
+            self.stdout.write(slowqueries.format_summary(
+                groups, limit=options['limit'], plans=options['plans']
+            ))
+
+        if options['clear']:
+            open(path, 'w').close()
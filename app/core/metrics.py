@@ -0,0 +1,239 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_requests_total': 'Requests handled, by view name, method and status.',
+    'http_request_duration_seconds': 'Request latency by view name.',
+    'db_queries_total': 'Database queries executed, by view name.',
+    'emails_sent_total': 'Emails handed to the email backend.',
+    'password_hashes_total': 'Password hashes computed or checked.',
+    'throttled_requests_total': 'Requests rejected by rate limits, by rate name.',
+}
+
+
+class Registry:
+    """
+    Counters and histograms of this process. Every process flushes them
+    to its own file in METRICS_DIR, and a scrape sums all the files, so
+    the answer does not depend on which worker serves it.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.ensure_process()
+
+    def ensure_process(self):
+        """
+        Start afresh in a process forked after import, e.g. a preforked
+        worker, which must not write to the file of its parent nor count
+        what the parent counted
+        """
+        pid = os.getpid()
+        if pid == self.pid:
+            return
+        self.pid = pid
+        self.lock = threading.Lock()
+        self.reset()
+        # pid alone can be reused by a later process
+        self.file_name = 'metrics-{}-{}.json'.format(pid, uuid.uuid4().hex[:8])
+        self.claimed = False
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        self.ensure_process()
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """ Add value to the histogram, buckets are kept cumulative """
+        if not settings.METRICS_ENABLED:
+            return
+        self.ensure_process()
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(DURATION_BUCKETS), 0.0, 0]
+            buckets = histogram[0]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    buckets[index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        self.ensure_process()
+        with self.lock:
+            return {
+                'counters': [
+                    [name, labels, value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, labels, list(buckets), total, count]
+                    for (name, labels), (buckets, total, count) in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """
+        Write this process' metrics to its file, at most once per
+        METRICS_FLUSH_INTERVAL unless forced
+        """
+        self.ensure_process()
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.last_flush = now
+
+        path = os.path.join(directory, self.file_name)
+        tmp_path = path + '.tmp'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if not self.claimed:
+                # files of an earlier process with our pid, it is gone
+                for stale in glob.glob(os.path.join(directory, 'metrics-{}-*.json'.format(os.getpid()))):
+                    if os.path.basename(stale) != self.file_name:
+                        remove(stale)
+                self.claimed = True
+            with open(tmp_path, 'w') as tmp_file:
+                json.dump(self.snapshot(), tmp_file)
+            # readers never see a half written file
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning('Could not write metrics to %s', path, exc_info=True)
+
+    def collect(self):
+        """
+        Sum metrics of all processes, or of this one without METRICS_DIR
+        """
+        directory = settings.METRICS_DIR
+        if not directory:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush(force=True)
+            snapshots = []
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                if not process_alive(path):
+                    remove(path)
+                    continue
+                try:
+                    with open(path) as metrics_file:
+                        snapshots.append(json.load(metrics_file))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                summed = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+                summed[0] = [a + b for a, b in zip(summed[0], buckets)]
+                summed[1] += total
+                summed[2] += count
+        return counters, histograms
+
+
+def process_alive(path):
+    """
+    Whether the process that wrote the metrics file is still running
+    """
+    try:
+        pid = int(os.path.basename(path).split('-')[1])
+        os.kill(pid, 0)
+    except (IndexError, ValueError):
+        return False
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # running under another user
+        return True
+    return True
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for key, value in pairs
+    ) + '}'
+
+
+def render():
+    """
+    Return the aggregated metrics in Prometheus text format
+    """
+    counters, histograms = registry.collect()
+    lines = []
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append('# HELP {} {}'.format(name, HELP.get(name, name)))
+        lines.append('# TYPE {} counter'.format(name))
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append('{}{} {}'.format(name, format_labels(labels), value))
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append('# HELP {} {}'.format(name, HELP.get(name, name)))
+        lines.append('# TYPE {} histogram'.format(name))
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, value in zip(DURATION_BUCKETS, buckets):
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels, [('le', repr(bound))]), value
+                ))
+            lines.append('{}_bucket{} {}'.format(
+                name, format_labels(labels, [('le', '+Inf')]), count
+            ))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels), total))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels), count))
+
+    return '\n'.join(lines) + '\n'
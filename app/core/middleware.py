@@ -0,0 +1,362 @@
+import json
+import logging
+import mimetypes
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.permissions import SAFE_METHODS
+
+from core import compression, db_routers, metrics, slowqueries, timing
+
+
+timing_logger = logging.getLogger('core.timing')
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header and a log line breaking the request down
+    into db, auth, hash, jwt, email and render phases. With SERVER_TIMING
+    turned off the middleware removes itself from the stack.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = timing.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(timing.db_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            timings = timing.stop(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = ', '.join(
+            ['{};dur={:.2f};desc="{}x"'.format(phase, seconds * 1000, count)
+             for phase, (seconds, count) in sorted(timings.items())]
+            + ['total;dur={:.2f}'.format(total * 1000)]
+        )
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+        }
+        for phase, (seconds, count) in timings.items():
+            record[phase + '_ms'] = round(seconds * 1000, 2)
+            record[phase + '_count'] = count
+        timing_logger.info(json.dumps(record, sort_keys=True))
+
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Time rendering, which happens after this hook returns
+        """
+        started = time.perf_counter()
+
+        def rendered(response):
+            timing.add('render', time.perf_counter() - started)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records request counts, latency and query counts per URL name for
+    the /metrics endpoint, see core.metrics
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        # unresolved paths share one label so 404 scans cannot blow up the series
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unresolved>'
+        metrics.inc(
+            'http_requests_total',
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.observe('http_request_duration_seconds', duration, view=view)
+        if queries[0]:
+            metrics.inc('db_queries_total', queries[0], view=view)
+        metrics.registry.flush()
+
+        return response
+
+
+class SlowQueryMiddleware:
+    """
+    Lets slow queries recorded by core.slowqueries name the view
+    that issued them
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slowqueries.set_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            slowqueries.reset_request(token)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes reads of safe requests to replica-safe views to the replicas.
+    After a successful write the client is pinned to the primary for
+    REPLICA_PIN_SECONDS, by cookie and by its Authorization header, so
+    it reads its own writes while the replicas catch up.
+    """
+    pin_cookie = 'db_pin'
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_routers.use_replica(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_routers.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and db_routers.is_replica_safe(view_func)
+            and not self.is_pinned(request)
+        ):
+            db_routers.use_replica()
+
+    def is_pinned(self, request):
+        if self.pin_cookie in request.COOKIES:
+            return True
+        key = db_routers.pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def pin(self, request, response):
+        response.set_cookie(
+            self.pin_cookie, '1',
+            max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+        )
+        key = db_routers.pin_key(request)
+        if key is not None:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+
+
+class PathSkipMixin:
+    """
+    Skips the middleware for requests under LEAN_MIDDLEWARE_PATHS, the
+    JWT-only API needs no sessions, messages or CSRF cookies. Subclasses
+    of the Django classes keep admin system checks passing.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.lean_paths = tuple(settings.LEAN_MIDDLEWARE_PATHS)
+
+    def is_lean(self, request):
+        return bool(self.lean_paths) and request.path_info.startswith(self.lean_paths)
+
+    def __call__(self, request):
+        if self.is_lean(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class LeanSessionMiddleware(PathSkipMixin, SessionMiddleware):
+    pass
+
+
+class LeanCsrfViewMiddleware(PathSkipMixin, CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        # view hooks are called by the handler, not by __call__
+        if self.is_lean(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class LeanAuthenticationMiddleware(PathSkipMixin, AuthenticationMiddleware):
+    pass
+
+
+class LeanMessageMiddleware(PathSkipMixin, MessageMiddleware):
+    pass
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses to GET and HEAD with brotli when it is installed
+    and accepted, gzip otherwise. Streaming responses are compressed chunk
+    by chunk instead of being buffered, bodies under COMPRESSION_MIN_SIZE
+    are sent as they are, and compressed bodies of responses with an ETag
+    are kept in an LRU cache of COMPRESSION_CACHE_SIZE entries.
+
+    Responses to other methods are left alone, they may carry freshly
+    minted tokens next to reflected input.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache = compression.LRUCache(settings.COMPRESSION_CACHE_SIZE)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in ('GET', 'HEAD')
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not compression.compressible(response.get('Content-Type'))
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        encoding = compression.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            content = self.compress(request, response, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        # the compressed body is no longer byte for byte the same
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compress(self, request, response, encoding):
+        etag = response.get('ETag')
+        if not etag:
+            return compression.compress(response.content, encoding)
+
+        key = (request.get_full_path(), response['Content-Type'], etag, encoding)
+        content = self.cache.get(key)
+        if content is None:
+            content = compression.compress(response.content, encoding)
+            self.cache.set(key, content)
+        return content
+
+
+class StaticFilesMiddleware:
+    """
+    Serves files collected into STATIC_ROOT under STATIC_URL. Hashed names
+    from the collectstatic manifest never change and are cached by clients
+    for a year, other files are revalidated by Last-Modified. The ``.br``
+    or ``.gz`` variant written by core.storage is sent when the client
+    accepts it. Bodies go out through FileResponse, so servers offering
+    wsgi.file_wrapper send them with sendfile.
+
+    STATIC_ROOT is indexed once at startup, run collectstatic before.
+    """
+
+    FOREVER = 'public, max-age=31536000, immutable'
+    REVALIDATE = 'public, no-cache'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        root = settings.STATIC_ROOT
+        if not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed()
+        self.files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                self.files[settings.STATIC_URL + relative] = path
+        self.hashed = set()
+        try:
+            with open(os.path.join(root, 'staticfiles.json')) as manifest:
+                self.hashed = set(json.load(manifest)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def __call__(self, request):
+        path = self.files.get(request.path_info)
+        if path is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        return self.serve(request, path)
+
+    def serve(self, request, path):
+        name = request.path_info[len(settings.STATIC_URL):]
+        variants = {
+            encoding: self.files.get(request.path_info + suffix)
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+        }
+        encoding = None
+        if any(variants.values()):
+            encoding = compression.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            if not variants.get(encoding):
+                encoding = None
+
+        served = variants[encoding] if encoding else path
+        mtime = int(os.stat(served).st_mtime)
+        response = get_conditional_response(request, last_modified=mtime)
+        if response is None:
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            response = FileResponse(open(served, 'rb'), content_type=content_type)
+            response['Last-Modified'] = http_date(mtime)
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        response['Cache-Control'] = self.FOREVER if name in self.hashed else self.REVALIDATE
+        if any(variants.values()):
+            patch_vary_headers(response, ('Accept-Encoding', ))
+        return response
@@ -0,0 +1,27 @@
+# Generated by Django 3.1.14 on 2026-10-19 16:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_user_is_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshTokenFamily',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('current_jti', models.CharField(max_length=255)),
+                ('revoked', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('rotated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_families', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-19 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_refreshtokenfamily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='deletion_requested_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import (
@@ -5,10 +8,61 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
-from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import metrics
+from core.cache import invalidate_profiles
+from core.timing import timed
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    """
+    Set based operations for admin bulk actions, each is a single
+    UPDATE of the rows that change and one cache invalidation
+    """
+
+    def set_flags(self, **flags):
+        """
+        Update flags of the users and return how many changed
+        """
+        changing = models.Q()
+        for name, value in flags.items():
+            changing |= ~models.Q(**{name: value})
+        ids = list(self.filter(changing).values_list('pk', flat=True))
+        if not ids:
+            return 0
+        # update() skips save(), so updated_at is set by hand
+        count = self.model._default_manager.filter(pk__in=ids).update(
+            updated_at=timezone.now(), **flags
+        )
+        invalidate_profiles(ids)
+        if flags.get('is_active') is False:
+            from core.authentication import evict_user
+
+            for user_id in ids:
+                evict_user(user_id)
+        return count
+
+    def activate(self):
+        # users waiting for deletion stay inactive
+        return self.filter(deletion_requested_at__isnull=True).set_flags(is_active=True)
+
+    def deactivate(self):
+        return self.set_flags(is_active=False)
+
+    def verify(self):
+        return self.set_flags(is_verified=True)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+
+    def get_by_natural_key(self, email):
+        """
+        Lookup of login and password reset, a prepared statement when
+        DB_PREPARED_STATEMENTS is on
+        """
+        from core import prepared
+
+        return prepared.get_user(self.model.USERNAME_FIELD, email, using=self._db)
 
     def create_user(self, email, password=None, **extra_fields):
         """
@@ -53,6 +107,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # set when the user asked to be deleted, core.deletion removes the
+    # account and its rows in batches later
+    deletion_requested_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     objects = UserManager()
     # by default it is user name but we want to change it to email
@@ -64,18 +121,117 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def tokens(self):
         """ Creates access and refresh(in case it expires) tokens for user """
-        refresh = RefreshToken.for_user(self)
-        return {
-            'refresh': str(refresh),
-            'access': str(refresh.access_token)
-        }
-
-    def save(self, *args, **kwargs):
+        from core.tokens import FamilyRefreshToken
+
+        with timed('jwt'):
+            refresh = FamilyRefreshToken.for_user(self)
+            return {
+                'refresh': str(refresh),
+                'access': str(refresh.access_token)
+            }
+
+    def set_password(self, raw_password):
+        metrics.inc('password_hashes_total', operation='set')
+        with timed('hash'):
+            super().set_password(raw_password)
+
+    def check_password(self, raw_password):
+        metrics.inc('password_hashes_total', operation='check')
+        with timed('hash'):
+            return super().check_password(raw_password)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self.remember_loaded_values(fields)
+
+    def remember_loaded_values(self, fields=None):
         """
-        On save update timestamp
+        Keep the values as they are in the database to find changed
+        fields on save, only for the given fields if there are any
+        """
+        loaded = getattr(self, '_loaded_values', {}) if fields else {}
+        for field in self._meta.concrete_fields:
+            if fields and field.name not in fields and field.attname not in fields:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """
+        Return names of fields changed since the user was loaded,
+        or None if it is not known what was loaded
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (field.attname not in loaded
+                 or loaded[field.attname] != self.__dict__[field.attname])
+        ]
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        """
+        On save update timestamp, existing users write only changed fields
+        and a save without changes does not touch the database at all
         """
         if not self.id:
             self.created_at = timezone.now()
+        elif update_fields is None and not force_insert \
+                and (using is None or using == self._state.db):
+            update_fields = self.get_dirty_fields()
+            if update_fields == []:
+                return
+
+        if update_fields is not None:
+            update_fields = list(update_fields)
+            if update_fields and 'updated_at' not in update_fields:
+                update_fields.append('updated_at')
         self.updated_at = timezone.now()
 
-        return super(User, self).save(*args, **kwargs)
+        super(User, self).save(
+            force_insert=force_insert,
+            force_update=force_update,
+            using=using,
+            update_fields=update_fields
+        )
+        # fields left out of update_fields were not written, they stay dirty
+        if update_fields is None:
+            self.remember_loaded_values()
+        elif update_fields:
+            self.remember_loaded_values(update_fields)
+        invalidate_profiles([self.pk])
+        if not self.is_active:
+            from core.authentication import evict_user
+
+            evict_user(self.pk)
+
+
+class RefreshTokenFamily(models.Model):
+    """
+    Refresh tokens rotated from one login, only the latest may be used
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='token_families'
+    )
+    current_jti = models.CharField(max_length=255)
+    revoked = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    rotated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+
+        return str(self.id)
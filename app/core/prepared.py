@@ -0,0 +1,141 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections, router, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def user_statement(field_name):
+    def sql(connection):
+        User = get_user_model()
+        quote = connection.ops.quote_name
+        return 'SELECT {} FROM {} WHERE {} = $1'.format(
+            ', '.join(quote(field.column) for field in User._meta.concrete_fields),
+            quote(User._meta.db_table),
+            quote(User._meta.get_field(field_name).column),
+        )
+    return sql
+
+
+def blacklist_statement(connection):
+    from rest_framework_simplejwt.token_blacklist.models import (
+        BlacklistedToken,
+        OutstandingToken,
+    )
+    quote = connection.ops.quote_name
+    return 'SELECT 1 FROM {} b JOIN {} o ON b.{} = o.{} WHERE o.{} = $1 LIMIT 1'.format(
+        quote(BlacklistedToken._meta.db_table),
+        quote(OutstandingToken._meta.db_table),
+        quote(BlacklistedToken._meta.get_field('token').column),
+        quote(OutstandingToken._meta.pk.column),
+        quote(OutstandingToken._meta.get_field('jti').column),
+    )
+
+
+# statement name -> function building its SQL for a connection
+STATEMENTS = {
+    'user_by_id': user_statement('id'),
+    'user_by_email': user_statement('email'),
+    'blacklisted_jti': blacklist_statement,
+}
+
+USER_STATEMENTS = {
+    'id': 'user_by_id',
+    'pk': 'user_by_id',
+    'email': 'user_by_email',
+}
+
+
+def enabled(connection):
+    """
+    Statements are prepared only on persistent Postgres connections,
+    with CONN_MAX_AGE 0 every request would pay for a PREPARE
+    """
+    return (
+        settings.DB_PREPARED_STATEMENTS
+        and connection.vendor == 'postgresql'
+        and connection.settings_dict['CONN_MAX_AGE'] != 0
+    )
+
+
+def prepare(connection, name):
+    """
+    PREPARE the statement on the connection unless it already is, on
+    first use, and return whether it is prepared. A statement that fails
+    to prepare, e.g. before the first migrate, is not retried on the
+    same server connection.
+    """
+    connection.ensure_connection()
+    # prepared statements live as long as the server connection, the
+    # wrapper outlives it when Django reconnects
+    state = getattr(connection, 'prepared_state', None)
+    if state is None or state[0] is not connection.connection:
+        state = connection.prepared_state = (connection.connection, {})
+    statements = state[1]
+
+    if name not in statements:
+        try:
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute('PREPARE {} AS {}'.format(name, STATEMENTS[name](connection)))
+        except DatabaseError as e:
+            logger.warning('Could not prepare %s: %s', name, e)
+            statements[name] = False
+        else:
+            statements[name] = True
+    return statements[name]
+
+
+def run(connection, name, value):
+    """ EXECUTE a statement prepared on the connection, return its first row """
+    with connection.cursor() as cursor:
+        cursor.execute('EXECUTE {} (%s)'.format(name), [value])
+        return cursor.fetchone()
+
+
+def execute(connection, name, value):
+    """
+    Run a prepared statement and return its first row, or raise
+    LookupError when statements are not prepared on this connection
+    """
+    if name is None or not enabled(connection) or not prepare(connection, name):
+        raise LookupError(name)
+    return run(connection, name, value)
+
+
+def user_from_row(alias, row):
+    User = get_user_model()
+    attnames = [field.attname for field in User._meta.concrete_fields]
+    return User.from_db(alias, attnames, row)
+
+
+def get_user(field_name, value, using=None):
+    """
+    User whose field equals value, by a prepared statement when there is
+    one for the field on the connection and with the ORM otherwise.
+    Raises User.DoesNotExist like QuerySet.get().
+    """
+    User = get_user_model()
+    alias = using or router.db_for_read(User)
+    try:
+        row = execute(connections[alias], USER_STATEMENTS.get(field_name), value)
+    except LookupError:
+        return User._default_manager.db_manager(alias).get(**{field_name: value})
+
+    if row is None:
+        raise User.DoesNotExist('User matching query does not exist.')
+    return user_from_row(alias, row)
+
+
+def is_blacklisted(jti):
+    """
+    Whether the refresh token with this jti is in the simplejwt blacklist
+    """
+    from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+    alias = router.db_for_read(BlacklistedToken)
+    try:
+        return execute(connections[alias], 'blacklisted_jti', jti) is not None
+    except LookupError:
+        return BlacklistedToken.objects.using(alias).filter(token__jti=jti).exists()
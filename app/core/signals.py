@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from core import slowqueries
+from core.cache import invalidate_profiles
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_deleted_user_profile(sender, instance, **kwargs):
+    """
+    Deleted users must not be served from the profile cache
+    """
+    invalidate_profiles([instance.pk])
+
+
+@receiver(connection_created)
+def capture_slow_queries(sender, connection, **kwargs):
+    """
+    Wrap new connections with the slow query capture when it is on
+    """
+    if settings.SLOW_QUERY_ENABLED:
+        slowqueries.install(connection)
+
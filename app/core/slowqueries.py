@@ -0,0 +1,160 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# request being handled, set by SlowQueryMiddleware
+_request = contextvars.ContextVar('slow_query_request', default=None)
+
+# set while EXPLAIN runs, so the plan query is not recorded itself
+_explaining = contextvars.ContextVar('slow_query_explaining', default=False)
+
+_lock = threading.Lock()
+records = deque(maxlen=500)
+
+
+def set_request(request):
+    return _request.set(request)
+
+
+def reset_request(token):
+    _request.reset(token)
+
+
+def current_view():
+    """
+    URL name of the view issuing the query, the path before the URL
+    is resolved and '<no request>' outside of requests
+    """
+    request = _request.get()
+    if request is None:
+        return '<no request>'
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else request.path
+
+
+def explain(connection, sql, params):
+    """
+    Return the EXPLAIN (ANALYZE, BUFFERS) plan of a SELECT on Postgres,
+    None for other queries and databases. ANALYZE runs the query again.
+    """
+    if connection.vendor != 'postgresql' or not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+    except Exception:
+        logger.warning('Could not explain slow query', exc_info=True)
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def record(entry):
+    with _lock:
+        records.append(entry)
+    if settings.SLOW_QUERY_LOG:
+        try:
+            with open(settings.SLOW_QUERY_LOG, 'a') as log_file:
+                log_file.write(json.dumps(entry) + '\n')
+        except OSError:
+            logger.warning('Could not write slow query log', exc_info=True)
+
+
+class SlowQueryWrapper:
+    """
+    connection.execute_wrapper recording queries slower than
+    SLOW_QUERY_THRESHOLD_MS with the view that issued them
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explaining.get():
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                record({
+                    'sql': sql,
+                    'params': repr(params) if settings.SLOW_QUERY_LOG_PARAMS and not many else None,
+                    'duration_ms': round(duration_ms, 2),
+                    'view': current_view(),
+                    'database': self.connection.alias,
+                    'plan': None if many else explain(self.connection, sql, params),
+                    'time': time.time(),
+                })
+
+
+def install(connection):
+    """ Start capturing slow queries of the connection, once """
+    if not any(isinstance(wrapper, SlowQueryWrapper) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryWrapper(connection))
+
+
+def uninstall(connection):
+    connection.execute_wrappers[:] = [
+        wrapper for wrapper in connection.execute_wrappers
+        if not isinstance(wrapper, SlowQueryWrapper)
+    ]
+
+
+def load(path):
+    """ Read records from a SLOW_QUERY_LOG file """
+    entries = []
+    with open(path) as log_file:
+        for line in log_file:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def summarize(entries):
+    """
+    Group records by SQL, which keeps placeholders instead of values,
+    slowest total time first
+    """
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['sql'], {
+            'sql': entry['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': set(),
+            'plan': None,
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['views'].add(entry['view'])
+        if entry['duration_ms'] >= group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+            group['plan'] = entry.get('plan') or group['plan']
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+
+def format_summary(groups, limit=10, plans=False):
+    lines = []
+    for group in groups[:limit]:
+        lines.append('{:>5}x  total {:>9.1f} ms  max {:>8.1f} ms  {}'.format(
+            group['count'], group['total_ms'], group['max_ms'],
+            ', '.join(sorted(group['views']))
+        ))
+        lines.append('    ' + group['sql'])
+        if plans and group['plan']:
+            lines.extend('      ' + line for line in group['plan'].splitlines())
+    return '\n'.join(lines)
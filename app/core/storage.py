@@ -0,0 +1,47 @@
+import gzip
+import mimetypes
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from core.compression import brotli, compressible
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage also writing ``.gz`` and, when the brotli
+    package is installed, ``.br`` variants of compressible hashed files
+    at collectstatic time, for StaticFilesMiddleware to serve as they are
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if compressible(mimetypes.guess_type(name)[0]):
+                self.write_variants(name)
+
+    def write_variants(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+
+        # mtime 0 keeps the gzip output the same from build to build
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as target:
+                    target.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic has not run, as in development and tests
+            return name
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import connections
+from django_nose import NoseTestSuiteRunner
+
+from core import slowqueries
+
+
+class SlowQueryReportMixin:
+    """
+    Captures slow queries during the test run and prints the slowest
+    ones at the end, grouped by SQL with the views that issued them
+    """
+    slow_query_limit = 10
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.SLOW_QUERY_ENABLED = True
+        for connection in connections.all():
+            slowqueries.install(connection)
+
+    def setup_databases(self, **kwargs):
+        old_config = super().setup_databases(**kwargs)
+        # migrations of the test databases are not worth reporting
+        slowqueries.records.clear()
+        return old_config
+
+    def teardown_test_environment(self, **kwargs):
+        groups = slowqueries.summarize(list(slowqueries.records))
+        if groups:
+            print('\nSlowest queries over {} ms:'.format(settings.SLOW_QUERY_THRESHOLD_MS))
+            print(slowqueries.format_summary(groups, limit=self.slow_query_limit))
+        super().teardown_test_environment(**kwargs)
+
+
+class SlowQueryNoseTestSuiteRunner(SlowQueryReportMixin, NoseTestSuiteRunner):
+    pass
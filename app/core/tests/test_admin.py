@@ -1,5 +1,9 @@
-from django.test import TestCase, Client
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
 from django.urls import reverse
 from rest_framework.test import force_authenticate, APIClient
 
@@ -54,3 +58,102 @@ class TestsAdminSite(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_admin_action_activates_users(self):
+        """
+        Test the activate action of the changelist updates selected users
+        """
+        get_user_model().objects.filter(id=self.user.id).update(is_active=False)
+
+        res = self.client.post(reverse('admin:core_user_changelist'), {
+            'action': 'activate_users',
+            '_selected_action': [self.user.id],
+        })
+
+        self.assertEqual(res.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+    def test_view_only_staff_cannot_run_actions(self):
+        """
+        Test staff with only the view permission get no user actions
+        """
+        viewer = get_user_model().objects.create_user(
+            email='viewer@londonappdev.com', password='password123', is_staff=True
+        )
+        viewer.user_permissions.add(Permission.objects.get(codename='view_user'))
+        self.client.force_login(viewer)
+        changelist = reverse('admin:core_user_changelist')
+
+        for action in ('activate_users', 'deactivate_users', 'verify_users', 'resend_verification'):
+            self.client.post(changelist, {
+                'action': action,
+                '_selected_action': [self.user.id],
+            })
+
+        self.assertNotContains(self.client.get(changelist), 'deactivate_users')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+        self.assertFalse(self.user.is_verified)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(EMAIL_ASYNC=False)
+    def test_bulk_api_resends_verification(self):
+        """
+        Test bulk endpoint sends verification only to unverified users
+        """
+        self.client.force_authenticate(user=self.admin_user)
+        get_user_model().objects.filter(id=self.admin_user.id).update(is_verified=True)
+
+        res = self.client.post(reverse('user:user-bulk'), {
+            'action': 'resend_verification',
+            'ids': [self.user.id, self.admin_user.id],
+        }, format='json')
+
+        self.assertEqual(res.data, {'action': 'resend_verification', 'count': 1})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+
+    def test_bulk_api_verifies_users(self):
+        """
+        Test bulk endpoint verifies the users in one request
+        """
+        self.client.force_authenticate(user=self.admin_user)
+
+        res = self.client.post(reverse('user:user-bulk'), {
+            'action': 'verify',
+            'ids': [self.user.id],
+        }, format='json')
+
+        self.assertEqual(res.data['count'], 1)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+
+    def test_bulk_api_rejects_unknown_action(self):
+        """
+        Test bulk endpoint validates the action name
+        """
+        self.client.force_authenticate(user=self.admin_user)
+
+        res = self.client.post(reverse('user:user-bulk'), {
+            'action': 'delete',
+            'ids': [self.user.id],
+        }, format='json')
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_users_list_sparse_fields_prunes_columns(self):
+        """
+        Test ?fields= trims list items and the selected columns
+        """
+        self.client.force_authenticate(user=self.admin_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse('user:user-list'), {'fields': 'email'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(set(res.data[0]), {'email'})
+        selects = [q['sql'] for q in queries if '"core_user"."email"' in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('"password"', selects[0])
+        self.assertNotIn('"name"', selects[0])
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.backends import TokenBackend
+
+from core.authentication import TokenCache, token_cache
+
+
+class TestsTokenCache(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='password123', is_verified=True
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.user.tokens()['access'])
+        self.url = reverse('user:update')
+
+    def test_signature_is_verified_once(self):
+        """
+        Test a repeated access token is not decoded again
+        """
+        decode = TokenBackend.decode
+        with patch.object(TokenBackend, 'decode', autospec=True, side_effect=decode) as mocked:
+            for _ in range(3):
+                res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(mocked.call_count, 1)
+
+    def test_deactivated_user_is_evicted_and_rejected(self):
+        """
+        Test deactivating the user drops its tokens from the cache
+        """
+        self.client.get(self.url)
+        self.assertIn(self.user.pk, token_cache.by_user)
+
+        get_user_model().objects.filter(pk=self.user.pk).deactivate()
+
+        self.assertNotIn(self.user.pk, token_cache.by_user)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_save_of_inactive_user_evicts(self):
+        """
+        Test saving a user as inactive drops its tokens from the cache
+        """
+        self.client.get(self.url)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(len(token_cache.entries), 0)
+
+    def test_cache_is_bounded_and_expires(self):
+        """
+        Test least recently used and expired entries are dropped
+        """
+        cache = TokenCache(2)
+        cache.set(b'a', 'token a', 100, 1)
+        cache.set(b'b', 'token b', 100, 1)
+        cache.get(b'a', 0)
+        cache.set(b'c', 'token c', 10, 2)
+
+        self.assertIsNone(cache.get(b'b', 0))
+        self.assertEqual(cache.get(b'a', 0), 'token a')
+        self.assertIsNone(cache.get(b'c', 10))
+        self.assertEqual(cache.by_user, {1: {b'a'}})
@@ -0,0 +1,85 @@
+import os
+import socket
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from core.cache import profile_cache_key
+
+try:
+    import memcache
+except ImportError:
+    memcache = None
+
+
+MEMCACHED_LOCATION = os.environ.get('TEST_MEMCACHED_LOCATION', '127.0.0.1:11211')
+
+
+def memcached_available():
+    if memcache is None:
+        return False
+    host, _, port = MEMCACHED_LOCATION.partition(':')
+    try:
+        socket.create_connection((host, int(port or 11211)), timeout=0.2).close()
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+class TestsProfileInvalidation(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='password123', name='Test'
+        )
+
+    def test_profile_is_invalidated_on_commit(self):
+        """
+        Test a cached profile stays until the change is committed, so no
+        request can cache the old profile again in between
+        """
+        key = profile_cache_key(self.user.pk)
+        with transaction.atomic():
+            cache.set(key, {'name': 'Test'})
+            self.user.name = 'New name'
+            self.user.save()
+
+            self.assertIsNotNone(cache.get(key))
+
+        self.assertIsNone(cache.get(key))
+
+
+@skipUnless(memcached_available(), 'needs memcached at TEST_MEMCACHED_LOCATION')
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': MEMCACHED_LOCATION,
+        'KEY_PREFIX': 'app-test',
+    }
+})
+class TestsMemcachedBackend(TransactionTestCase):
+    """
+    The CACHE_LOCATION backend, against a local memcached
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_profile_cache_is_shared(self):
+        """
+        Test profiles are invalidated in the shared cache, where another
+        process would see them
+        """
+        user = get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='password123', name='Test'
+        )
+        key = profile_cache_key(user.pk)
+        caches['default'].set(key, {'name': 'Test'})
+        self.assertEqual(caches['default'].get(key), {'name': 'Test'})
+
+        user.save()
+
+        self.assertIsNone(caches['default'].get(key))
@@ -1,6 +1,12 @@
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -27,3 +33,49 @@ class CommandTests(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_loadtest_runs_auth_flow_in_process(self):
+        """
+        Test load test drives every endpoint of the flow and cleans up
+        """
+        out = StringIO()
+        call_command('loadtest', users=2, concurrency=1, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['mode'], 'in-process')
+        for item in report['endpoints']:
+            self.assertEqual(item['requests'], 2, item['endpoint'])
+            self.assertEqual(item['errors'], 0, item['endpoint'])
+        self.assertFalse(
+            get_user_model().objects.filter(email__startswith='loadtest-').exists()
+        )
+
+    def test_benchmark_writes_results_and_detects_regression(self):
+        """
+        Test benchmark results are written as JSON and compared with baseline
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'results.json')
+            call_command(
+                'benchmark', 'user.password_reset',
+                repeat=2, warmup=0, min_time=0, output=output, stdout=StringIO()
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)
+            self.assertEqual(set(results), {
+                'user.password_reset.make_token',
+                'user.password_reset.check_token',
+            })
+
+            # a baseline ten times faster than now must fail the comparison
+            baseline = os.path.join(tmp, 'baseline.json')
+            with open(baseline, 'w') as baseline_file:
+                json.dump({
+                    name: dict(stats, median=stats['median'] / 10)
+                    for name, stats in results.items()
+                }, baseline_file)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark', 'user.password_reset', repeat=2, warmup=0,
+                    min_time=0, baseline=baseline, stdout=StringIO()
+                )
@@ -0,0 +1,125 @@
+import gzip
+import json
+import zlib
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression
+from core.middleware import CompressionMiddleware
+
+
+class TestsCompressionMiddleware(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.body = json.dumps([{'email': 'user{}@example.com'.format(n)} for n in range(100)])
+
+    def respond(self, response, method='get', accept='gzip, deflate'):
+        request = getattr(self.factory, method)('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_large_json_is_gzipped(self):
+        """
+        Test large JSON bodies are compressed when gzip is accepted
+        """
+        res = self.respond(HttpResponse(self.body, content_type='application/json'))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content).decode(), self.body)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_small_and_binary_bodies_are_skipped(self):
+        """
+        Test small bodies and non text content types are sent as they are
+        """
+        small = self.respond(HttpResponse('{}', content_type='application/json'))
+        image = self.respond(HttpResponse(b'x' * 4096, content_type='image/png'))
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+
+    def test_post_and_not_accepted_are_skipped(self):
+        """
+        Test responses to POST and clients without gzip are not compressed
+        """
+        post = self.respond(HttpResponse(self.body, content_type='application/json'), 'post')
+        identity = self.respond(
+            HttpResponse(self.body, content_type='application/json'), accept='identity'
+        )
+
+        self.assertFalse(post.has_header('Content-Encoding'))
+        self.assertFalse(identity.has_header('Content-Encoding'))
+
+    def test_streaming_response_is_compressed_per_chunk(self):
+        """
+        Test every chunk of a streaming response is sent once compressed
+        """
+        chunks = [self.body.encode()] * 3
+        res = self.respond(StreamingHttpResponse(iter(chunks), content_type='text/csv'))
+
+        decompressor = zlib.decompressobj(31)
+        first = next(iter(res.streaming_content))
+        self.assertEqual(decompressor.decompress(first), chunks[0])
+        rest = b''.join(res.streaming_content)
+        self.assertEqual(decompressor.decompress(rest), b''.join(chunks[1:]))
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+
+    def test_etag_responses_are_cached_and_weakened(self):
+        """
+        Test compressed bodies of ETag responses are reused
+        """
+        middleware = CompressionMiddleware(None)
+
+        for _ in range(2):
+            response = HttpResponse(self.body, content_type='application/json')
+            response['ETag'] = '"abc"'
+            middleware.get_response = lambda request: response
+            res = middleware(self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        self.assertEqual(len(middleware.cache.entries), 1)
+        self.assertEqual(res['ETag'], 'W/"abc"')
+        self.assertEqual(gzip.decompress(res.content).decode(), self.body)
+
+    def test_choose_encoding(self):
+        """
+        Test Accept-Encoding negotiation honours q values
+        """
+        self.assertEqual(compression.choose_encoding('gzip;q=0.5'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('gzip;q=0'))
+        self.assertIsNone(compression.choose_encoding(''))
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        """
+        Test brotli is chosen when it is installed and accepted
+        """
+        res = self.respond(
+            HttpResponse(self.body, content_type='application/json'), accept='gzip, br'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(res.content).decode(), self.body)
+
+
+class TestsCompressedApi(TestCase):
+    def test_user_list_is_compressed(self):
+        """
+        Test the user list goes out gzipped
+        """
+        admin = get_user_model().objects.create_superuser('admin@londonappdev.com', 'password123')
+        get_user_model().objects.bulk_create([
+            get_user_model()(email='user{}@londonappdev.com'.format(n), name='User')
+            for n in range(50)
+        ])
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        res = client.get(reverse('user:user-list'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))), 51)
@@ -0,0 +1,126 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import checks, db_routers
+from core.middleware import ReplicaRoutingMiddleware
+from user.views import LoginUserView, ManageUserView
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class TestsReplicaRouter(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = db_routers.ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, view):
+        """ Return the database reads of the view go to and the response """
+        routed = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            routed.append(self.router.db_for_read(get_user_model()))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return routed[0], response
+
+    def test_reads_outside_replica_safe_views_use_primary(self):
+        """
+        Test the router sends reads to the primary by default
+        """
+        self.assertEqual(self.router.db_for_read(get_user_model()), 'default')
+        self.assertEqual(self.router.db_for_write(get_user_model()), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'core'))
+
+    def test_safe_request_to_replica_safe_view_uses_replica(self):
+        """
+        Test GET of a view marked replica_safe reads from a replica
+        """
+        database, _ = self.route(self.factory.get('/'), ManageUserView.as_view())
+
+        self.assertEqual(database, 'replica_1')
+        self.assertEqual(self.router.db_for_read(get_user_model()), 'default')
+
+    def test_other_views_use_primary(self):
+        """
+        Test views not marked replica_safe read from the primary
+        """
+        database, _ = self.route(self.factory.get('/'), LoginUserView.as_view())
+
+        self.assertEqual(database, 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """
+        Test reads after a write use the primary, by cookie and by token
+        """
+        view = ManageUserView.as_view()
+        database, response = self.route(
+            self.factory.patch('/', HTTP_AUTHORIZATION='Bearer abc'), view
+        )
+
+        self.assertEqual(database, 'default')
+        self.assertIn(ReplicaRoutingMiddleware.pin_cookie, response.cookies)
+
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Bearer abc')
+        self.assertEqual(self.route(request, view)[0], 'default')
+
+        request = self.factory.get('/')
+        request.COOKIES[ReplicaRoutingMiddleware.pin_cookie] = '1'
+        self.assertEqual(self.route(request, view)[0], 'default')
+
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Bearer other')
+        self.assertEqual(self.route(request, view)[0], 'replica_1')
+
+    def test_local_memory_cache_is_reported(self):
+        """
+        Test the system check warns that pins in local memory are not
+        seen by other workers
+        """
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        memcached = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        }}
+
+        with override_settings(CACHES=locmem):
+            self.assertEqual(
+                [warning.id for warning in checks.check_replica_pin_cache(None)], ['core.W002']
+            )
+        with override_settings(CACHES=memcached):
+            self.assertEqual(checks.check_replica_pin_cache(None), [])
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'needs DB_REPLICA_HOSTS')
+class TestsReplicaReads(TransactionTestCase):
+    # the replica connection only sees committed rows
+    databases = '__all__'
+
+    def test_user_list_reads_from_replica(self):
+        """
+        Test the user list is queried on the replica
+        """
+        admin = get_user_model().objects.create_superuser(
+            'admin@londonappdev.com', 'password123'
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+
+        with CaptureQueriesContext(replica) as queries:
+            res = client.get(reverse('user:user-list'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(queries.captured_queries)
@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.admin.models import LogEntry, ADDITION
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from core import deletion
+from core.models import RefreshTokenFamily
+
+
+class TestsUserDeletion(TestCase):
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@londonappdev.com', password='password123'
+        )
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='password123', name='Test'
+        )
+        for _ in range(3):
+            self.user.tokens()
+        BlacklistedToken.objects.create(
+            token=OutstandingToken.objects.filter(user=self.user).first()
+        )
+        LogEntry.objects.log_action(
+            self.user.id, ContentType.objects.get_for_model(self.user).pk,
+            self.user.id, str(self.user), ADDITION
+        )
+
+    def test_request_deletion_deactivates_and_revokes(self):
+        """
+        Test marking a user deactivates it and revokes its token families
+        """
+        count = deletion.request_deletion(get_user_model().objects.filter(pk=self.user.pk))
+
+        self.user.refresh_from_db()
+        self.assertEqual(count, 1)
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deletion_requested_at)
+        self.assertFalse(RefreshTokenFamily.objects.filter(user=self.user, revoked=False).exists())
+
+    def test_purge_deletes_user_and_dependent_rows_in_batches(self):
+        """
+        Test purge removes marked users with tokens and log entries
+        """
+        deletion.request_deletion(get_user_model().objects.filter(pk=self.user.pk))
+
+        progress = list(deletion.purge(batch_size=2))
+
+        self.assertIn(('token_blacklist.OutstandingToken', 2), progress)
+        self.assertIn(('token_blacklist.OutstandingToken', 3), progress)
+        self.assertIn(('core.User', 1), progress)
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(OutstandingToken.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(LogEntry.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(RefreshTokenFamily.objects.filter(user_id=self.user.pk).exists())
+        self.assertTrue(get_user_model().objects.filter(pk=self.admin_user.pk).exists())
+
+    def test_purge_command_reports_progress(self):
+        """
+        Test purge_users command prints progress and the number of users
+        """
+        deletion.request_deletion(get_user_model().objects.filter(pk=self.user.pk))
+        out = StringIO()
+
+        call_command('purge_users', '--batch-size', '10', stdout=out)
+
+        self.assertIn('token_blacklist.OutstandingToken: 3 deleted', out.getvalue())
+        self.assertIn('Purged 1 users', out.getvalue())
+
+    def test_api_destroy_marks_user(self):
+        """
+        Test deleting through the API returns 202 and only marks the user
+        """
+        client = APIClient()
+        client.force_authenticate(self.admin_user)
+
+        res = client.delete(reverse('user:user-detail', args=[self.user.pk]))
+
+        self.assertEqual(res.status_code, 202)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deletion_requested_at)
+
+    def test_admin_delete_marks_user(self):
+        """
+        Test deleting in the admin marks the user instead of deleting it
+        """
+        self.client.force_login(self.admin_user)
+
+        res = self.client.post(
+            reverse('admin:core_user_delete', args=[self.user.pk]), {'post': 'yes'}
+        )
+
+        self.assertEqual(res.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.deletion_requested_at)
@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from user.throttling import local_store
+
+
+METRICS_URL = reverse('metrics')
+
+
+class TestsMetrics(TestCase):
+    def setUp(self):
+        local_store.clear()
+        metrics.registry.reset()
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            METRICS_DIR=self.metrics_dir.name, METRICS_ALLOWED_IPS=['127.0.0.1']
+        )
+        self.settings.enable()
+        self.client = APIClient()
+        self.payload = {'email': 'test@londonappdev.com', 'password': 'password123'}
+        get_user_model().objects.create_user(is_verified=True, **self.payload)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.metrics_dir.cleanup()
+        metrics.registry.reset()
+
+    def test_login_is_counted_by_url_name(self):
+        """
+        Test /metrics has request count, latency, queries and hashes of login
+        """
+        self.client.post(reverse('user:login'), self.payload)
+
+        content = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'http_requests_total{method="POST",status="200",view="user:login"} 1',
+            content
+        )
+        self.assertIn('http_request_duration_seconds_count{view="user:login"} 1', content)
+        self.assertIn('http_request_duration_seconds_bucket{view="user:login",le="+Inf"} 1', content)
+        self.assertIn('db_queries_total{view="user:login"}', content)
+        self.assertIn('password_hashes_total{operation="check"} 1', content)
+
+    def test_metrics_of_other_processes_are_summed(self):
+        """
+        Test a scrape adds up the files written by other worker processes
+        """
+        self.client.post(reverse('user:login'), self.payload)
+        other = {
+            'counters': [
+                ['http_requests_total', [['method', 'POST'], ['status', 200], ['view', 'user:login']], 4],
+                ['emails_sent_total', [], 2],
+            ],
+            'histograms': [],
+        }
+        with open(os.path.join(self.metrics_dir.name, 'metrics-1-other.json'), 'w') as other_file:
+            json.dump(other, other_file)
+
+        content = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'http_requests_total{method="POST",status="200",view="user:login"} 5',
+            content
+        )
+        self.assertIn('emails_sent_total 2', content)
+
+    def test_forked_process_writes_its_own_file(self):
+        """
+        Test a worker forked after import gets its own file and does not
+        count what its parent counted
+        """
+        metrics.inc('emails_sent_total', 3)
+        parent_file = metrics.registry.file_name
+
+        with patch('core.metrics.os.getpid', return_value=os.getpid() + 1):
+            metrics.inc('emails_sent_total')
+            snapshot = metrics.registry.snapshot()
+            child_file = metrics.registry.file_name
+
+        self.assertNotEqual(child_file, parent_file)
+        self.assertTrue(child_file.startswith('metrics-{}-'.format(os.getpid() + 1)))
+        self.assertEqual(snapshot['counters'], [['emails_sent_total', (), 1]])
+
+    def test_files_of_exited_processes_are_removed(self):
+        """
+        Test a scrape drops files written by processes that are gone
+        """
+        path = os.path.join(self.metrics_dir.name, 'metrics-99999999-gone.json')
+        with open(path, 'w') as gone_file:
+            json.dump({'counters': [['emails_sent_total', [], 7]], 'histograms': []}, gone_file)
+
+        content = self.client.get(METRICS_URL).content.decode()
+
+        self.assertNotIn('emails_sent_total 7', content)
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN='scrape-token')
+    def test_metrics_need_allowed_ip_or_token(self):
+        """
+        Test anonymous clients get 404 and scrapers with the token 200
+        """
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 404)
+        self.assertEqual(
+            self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong').status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200
+        )
+
+    @override_settings(METRICS_DIR='')
+    def test_without_directory_serves_own_metrics(self):
+        """
+        Test metrics of this process are served when no directory is set
+        """
+        self.client.post(reverse('user:login'), self.payload)
+
+        content = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn('view="user:login"', content)
+        self.assertEqual(os.listdir(self.metrics_dir.name), [])
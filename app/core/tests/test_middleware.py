@@ -0,0 +1,52 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import (
+    LeanAuthenticationMiddleware,
+    LeanCsrfViewMiddleware,
+    LeanSessionMiddleware,
+)
+
+
+def view(request):
+    return HttpResponse()
+
+
+@override_settings(LEAN_MIDDLEWARE_PATHS=['/api/'])
+class TestsLeanMiddleware(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = LeanSessionMiddleware(LeanAuthenticationMiddleware(view))
+
+    def test_api_requests_skip_session_and_auth(self):
+        """
+        Test requests under a lean path get no session or user
+        """
+        request = self.factory.get('/api/user/update/')
+
+        self.middleware(request)
+
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(hasattr(request, 'user'))
+
+    def test_admin_requests_keep_full_stack(self):
+        """
+        Test other paths still get a session and a user
+        """
+        request = self.factory.get('/admin/')
+
+        self.middleware(request)
+
+        self.assertTrue(hasattr(request, 'session'))
+        self.assertTrue(hasattr(request, 'user'))
+
+    def test_csrf_is_not_checked_on_api(self):
+        """
+        Test CSRF view check is skipped for lean paths only
+        """
+        middleware = LeanCsrfViewMiddleware(view)
+        api_request = self.factory.post('/api/user/login/')
+        admin_request = self.factory.post('/admin/login/')
+
+        self.assertIsNone(middleware.process_view(api_request, view, (), {}))
+        self.assertEqual(middleware.process_view(admin_request, view, (), {}).status_code, 403)
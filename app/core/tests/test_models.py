@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 
@@ -42,3 +44,74 @@ class TestsModel(TestCase):
 
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+    def test_save_without_changes_makes_no_queries(self):
+        """
+        Test saving a loaded user without changes does not hit the db
+        """
+        user = get_user_model().objects.create_user("test@londonappdev.com", "test123")
+        user = get_user_model().objects.get(id=user.id)
+        updated_at = user.updated_at
+
+        with self.assertNumQueries(0):
+            user.save()
+
+        self.assertEqual(user.updated_at, updated_at)
+
+    def test_save_writes_only_changed_fields(self):
+        """
+        Test saving a user updates changed fields and timestamp only
+        """
+        user = get_user_model().objects.create_user("test@londonappdev.com", "test123")
+        user = get_user_model().objects.get(id=user.id)
+        user.is_verified = True
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"is_verified"', sql)
+        self.assertIn('"updated_at"', sql)
+        self.assertNotIn('"password"', sql)
+        self.assertNotIn('"email"', sql)
+
+        user.refresh_from_db()
+        self.assertTrue(user.is_verified)
+        self.assertEqual(user.get_dirty_fields(), [])
+
+    def test_partial_save_keeps_other_changes_dirty(self):
+        """
+        Test fields left out of update_fields are still written by the
+        next full save
+        """
+        user = get_user_model().objects.create_user("test@londonappdev.com", "test123")
+        user = get_user_model().objects.get(id=user.id)
+        user.name = 'New name'
+        user.is_verified = True
+
+        user.save(update_fields=['name'])
+        self.assertEqual(user.get_dirty_fields(), ['is_verified'])
+        user.save()
+
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'New name')
+        self.assertTrue(user.is_verified)
+
+    def test_bulk_deactivate_is_one_update(self):
+        """
+        Test deactivating many users updates only changing rows at once
+        """
+        for number in range(3):
+            get_user_model().objects.create_user(
+                "test{}@londonappdev.com".format(number), "test123"
+            )
+        get_user_model().objects.filter(email="test0@londonappdev.com").update(is_active=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            count = get_user_model().objects.all().deactivate()
+
+        self.assertEqual(count, 2)
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(queries[1]['sql'].startswith('UPDATE'))
+        self.assertFalse(get_user_model().objects.filter(is_active=True).exists())
@@ -0,0 +1,137 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from core import checks, prepared, warmup
+from core.authentication import CachedJWTAuthentication
+from user.serializers import UserSerializer
+
+
+class TestsPreparedLookups(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='prepared@example.com', password='testpass123'
+        )
+
+    def test_get_user_by_id_and_email(self):
+        """
+        Test users are found by id and email
+        """
+        self.assertEqual(prepared.get_user('id', self.user.pk), self.user)
+        self.assertEqual(prepared.get_user('email', self.user.email), self.user)
+        self.assertEqual(
+            get_user_model().objects.get_by_natural_key(self.user.email), self.user
+        )
+
+    def test_missing_user_raises_does_not_exist(self):
+        """
+        Test a missing user raises DoesNotExist like QuerySet.get()
+        """
+        with self.assertRaises(get_user_model().DoesNotExist):
+            prepared.get_user('email', 'missing@example.com')
+
+    def test_is_blacklisted(self):
+        """
+        Test blacklisted jtis are found and others are not
+        """
+        token = OutstandingToken.objects.create(
+            user=self.user, jti='blacklisted', token='token', expires_at=self.user.created_at
+        )
+        BlacklistedToken.objects.create(token=token)
+
+        self.assertTrue(prepared.is_blacklisted('blacklisted'))
+        self.assertFalse(prepared.is_blacklisted('other'))
+
+    def test_authentication_loads_user_of_token(self):
+        """
+        Test JWT authentication loads the user of the token in one query
+        """
+        authentication = CachedJWTAuthentication()
+        token = authentication.get_validated_token(self.user.tokens()['access'].encode())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(authentication.get_user(token), self.user)
+
+    @override_settings(DB_PREPARED_STATEMENTS=True)
+    def test_not_prepared_without_persistent_connections(self):
+        """
+        Test statements are not prepared while CONN_MAX_AGE is 0 and the
+        system check warns about it
+        """
+        with patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            self.assertFalse(prepared.enabled(connection))
+            self.assertEqual(prepared.get_user('id', self.user.pk), self.user)
+
+        self.assertIn('core.W001', [
+            warning.id for warning in checks.check_prepared_statements(None)
+        ])
+
+    @skipUnless(connection.vendor == 'postgresql', 'prepared statements need Postgres')
+    @override_settings(DB_PREPARED_STATEMENTS=True)
+    def test_prepared_statements_are_used(self):
+        """
+        Test lookups prepare their statement on first use and then only
+        execute it
+        """
+        with patch.dict(connection.settings_dict, CONN_MAX_AGE=60):
+            prepared.get_user('id', self.user.pk)
+            prepared.is_blacklisted('other')
+
+            with self.assertNumQueries(2) as queries:
+                user = prepared.get_user('id', self.user.pk)
+                prepared.is_blacklisted('other')
+
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(all(
+            query['sql'].startswith('EXECUTE') for query in queries.captured_queries
+        ))
+
+
+class TestsWarmUp(SimpleTestCase):
+    databases = '__all__'
+
+    def test_serializers_of_routed_views_are_found(self):
+        """
+        Test warm up finds the serializers of the routed DRF views
+        """
+        self.assertIn(UserSerializer, warmup.serializer_classes(warmup.get_resolver()))
+
+    def test_warm_up_opens_persistent_connections_only(self):
+        """
+        Test warm up connects databases with CONN_MAX_AGE and leaves those
+        closed after every request alone
+        """
+        with patch.object(connection, 'ensure_connection') as ensure_connection:
+            with patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+                warmup.warm_up()
+            ensure_connection.assert_not_called()
+
+            with patch.dict(connection.settings_dict, CONN_MAX_AGE=60):
+                warmup.warm_up()
+            ensure_connection.assert_called_once_with()
+
+    def test_preforking_master_hands_no_connection_to_workers(self):
+        """
+        Test a process not serving requests closes its connections before
+        a fork and the child connects, while a serving worker does neither
+        """
+        self.addCleanup(setattr, warmup, '_serving', False)
+        with patch.object(warmup.connections, 'close_all') as close_all, \
+                patch.object(warmup, 'warm_up_connections') as warm_up_connections:
+            warmup._before_fork()
+            warmup._after_fork_in_child()
+            close_all.assert_called_once_with()
+            warm_up_connections.assert_called_once_with()
+
+            warmup._mark_serving()
+            warmup._before_fork()
+            warmup._after_fork_in_child()
+            close_all.assert_called_once_with()
+            warm_up_connections.assert_called_once_with()
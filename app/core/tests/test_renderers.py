@@ -0,0 +1,61 @@
+import datetime
+import decimal
+import io
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+class TestsFastJSON(TestCase):
+    def setUp(self):
+        self.data = {
+            'email': 'test@londonappdev.com',
+            'name': 'Zo\u00eb \u2028 line',
+            'error': _('Invalid token'),
+            'price': decimal.Decimal('1.50'),
+            'created_at': datetime.datetime(2021, 3, 16, 13, 38, 1, 123456),
+            'items': [1, 2.5, None, True],
+        }
+
+    def test_renderer_output_matches_drf(self):
+        """
+        Test fast renderer produces the same bytes as DRF renderer
+        """
+        self.assertEqual(
+            FastJSONRenderer().render(self.data),
+            JSONRenderer().render(self.data)
+        )
+
+    def test_renderer_falls_back_without_orjson(self):
+        """
+        Test renderer uses DRF encoder when orjson is not installed
+        """
+        with patch('core.renderers.orjson', None):
+            content = FastJSONRenderer().render(self.data)
+
+        self.assertEqual(content, JSONRenderer().render(self.data))
+
+    def test_parser_output_matches_drf(self):
+        """
+        Test fast parser decodes the same data as DRF parser
+        """
+        content = JSONRenderer().render(self.data)
+
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(content)),
+            JSONParser().parse(io.BytesIO(content))
+        )
+
+    def test_parser_raises_parse_error(self):
+        """
+        Test invalid JSON is reported as a parse error
+        """
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"email": '))
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import slowqueries
+from user.throttling import local_store
+
+
+@override_settings(SLOW_QUERY_ENABLED=True, SLOW_QUERY_THRESHOLD_MS=0)
+class TestsSlowQueries(TestCase):
+    def setUp(self):
+        local_store.clear()
+        self.log = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        self.log.close()
+        self.settings = override_settings(SLOW_QUERY_LOG=self.log.name)
+        self.settings.enable()
+        self.payload = {'email': 'test@londonappdev.com', 'password': 'password123'}
+        get_user_model().objects.create_user(is_verified=True, **self.payload)
+        slowqueries.install(connection)
+        slowqueries.records.clear()
+
+    def tearDown(self):
+        slowqueries.uninstall(connection)
+        slowqueries.records.clear()
+        self.settings.disable()
+        os.unlink(self.log.name)
+
+    def test_queries_are_recorded_with_view(self):
+        """
+        Test queries over the threshold are recorded with the URL name
+        """
+        APIClient().post(reverse('user:login'), self.payload)
+
+        views = {entry['view'] for entry in slowqueries.records}
+        self.assertIn('user:login', views)
+        self.assertTrue(any('core_user' in entry['sql'] for entry in slowqueries.records))
+
+    def test_queries_outside_requests_are_recorded(self):
+        """
+        Test queries issued outside of a request are recorded too
+        """
+        get_user_model().objects.count()
+
+        self.assertEqual(slowqueries.records[-1]['view'], '<no request>')
+
+    def test_params_are_not_recorded_by_default(self):
+        """
+        Test parameters of queries, such as password hashes, are left out
+        """
+        user = get_user_model().objects.create_user(
+            email='other@londonappdev.com', password='secret123'
+        )
+
+        self.assertTrue(slowqueries.records)
+        self.assertTrue(all(entry['params'] is None for entry in slowqueries.records))
+        with open(self.log.name) as log:
+            self.assertNotIn(user.password, log.read())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10000)
+    def test_fast_queries_are_skipped(self):
+        """
+        Test queries under the threshold are not recorded
+        """
+        get_user_model().objects.count()
+
+        self.assertEqual(len(slowqueries.records), 0)
+
+    def test_command_reports_logged_queries(self):
+        """
+        Test slowqueries command groups the log by SQL and lists views
+        """
+        APIClient().post(reverse('user:login'), self.payload)
+        out = StringIO()
+
+        call_command('slowqueries', '--view', 'user:login', '--clear', stdout=out)
+
+        self.assertIn('user:login', out.getvalue())
+        self.assertIn('core_user', out.getvalue())
+        self.assertEqual(os.path.getsize(self.log.name), 0)
@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import StaticFilesMiddleware
+
+
+class TestsStaticFiles(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        self.css = 'body { color: black; }\n' * 100
+        with open(os.path.join(self.source, 'site.css'), 'w') as f:
+            f.write(self.css)
+
+        settings = override_settings(
+            STATIC_URL='/static/',
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATICFILES_STORAGE='core.storage.CompressedManifestStaticFilesStorage',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        with open(os.path.join(self.root, 'staticfiles.json')) as f:
+            self.hashed = json.load(f)['paths']['site.css']
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('view'))
+        self.factory = RequestFactory()
+
+    def get(self, path, **extra):
+        return self.middleware(self.factory.get(path, **extra))
+
+    def test_collectstatic_writes_gzip_variant(self):
+        """
+        Test collectstatic writes a gzip variant next to the hashed file
+        """
+        with open(os.path.join(self.root, self.hashed + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()).decode(), self.css)
+        self.assertNotEqual(self.hashed, 'site.css')
+
+    def test_hashed_file_is_served_compressed_and_immutable(self):
+        """
+        Test hashed files are sent precompressed and cached for a year
+        """
+        res = self.get('/static/' + self.hashed, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Content-Type'], 'text/css')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(res.streaming_content)).decode(), self.css)
+
+    def test_unhashed_file_is_revalidated(self):
+        """
+        Test original names are served plain when no encoding is accepted
+        and answer 304 when not modified
+        """
+        res = self.get('/static/site.css', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res['Cache-Control'], 'public, no-cache')
+        self.assertEqual(b''.join(res.streaming_content).decode(), self.css)
+
+        res = self.get('/static/site.css', HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+        self.assertEqual(res.status_code, 304)
+
+    def test_unknown_paths_reach_the_view(self):
+        """
+        Test paths not collected into STATIC_ROOT are left to the views
+        """
+        res = self.get('/static/missing.css')
+
+        self.assertEqual(res.content, b'view')
+
+    def test_without_static_root_middleware_is_unused(self):
+        """
+        Test the middleware is disabled until collectstatic has run
+        """
+        with override_settings(STATIC_ROOT=os.path.join(self.root, 'missing')):
+            with self.assertRaises(MiddlewareNotUsed):
+                StaticFilesMiddleware(lambda request: HttpResponse())
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from user.throttling import local_store
+
+
+@override_settings(SERVER_TIMING=True)
+class TestsServerTiming(TestCase):
+    def setUp(self):
+        local_store.clear()
+        self.client = APIClient()
+        self.payload = {'email': 'test@londonappdev.com', 'password': 'password123'}
+        get_user_model().objects.create_user(is_verified=True, **self.payload)
+
+    def test_login_has_phase_breakdown(self):
+        """
+        Test login response has Server-Timing entries for every phase
+        """
+        with self.assertLogs('core.timing', level='INFO') as logs:
+            res = self.client.post(reverse('user:login'), self.payload)
+
+        phases = [entry.split(';')[0] for entry in res['Server-Timing'].split(', ')]
+        for phase in ('auth', 'db', 'hash', 'jwt', 'render', 'total'):
+            self.assertIn(phase, phases)
+        self.assertIn('"auth_ms"', logs.output[0])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_no_header_when_disabled(self):
+        """
+        Test Server-Timing header is not sent when timing is turned off
+        """
+        res = APIClient().post(reverse('user:login'), self.payload)
+
+        self.assertNotIn('Server-Timing', res)
@@ -0,0 +1,56 @@
+import contextvars
+import time
+
+
+# phase name -> [seconds, count] of the request being handled,
+# None when timing is turned off or outside of a request
+_timings = contextvars.ContextVar('server_timings', default=None)
+
+
+def start():
+    """ Start collecting timings in the current context """
+    return _timings.set({})
+
+
+def stop(token):
+    """ Stop collecting and return what was collected """
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings
+
+
+def add(phase, seconds):
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.setdefault(phase, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += 1
+
+
+class timed:
+    """
+    Context manager adding the time spent in the block to the phase,
+    it only reads a context variable when timing is turned off
+    """
+    __slots__ = ('phase', 'started')
+
+    def __init__(self, phase):
+        self.phase = phase
+        self.started = None
+
+    def __enter__(self):
+        if _timings.get() is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.started is not None:
+            add(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """ connection.execute_wrapper timing every query as the 'db' phase """
+    with timed('db'):
+        return execute(sql, params, many, context)
@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import prepared
+from core.models import RefreshTokenFamily
+
+
+FAMILY_CLAIM = 'fam'
+
+# the cached state of a family is the jti of its latest refresh token,
+# or an empty string once the family is revoked
+REVOKED = ''
+
+
+def family_cache_key(family_id):
+    return 'token-family:{}'.format(family_id)
+
+
+def cache_family_state(family_id, state):
+    cache.set(
+        family_cache_key(family_id),
+        state,
+        int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    )
+
+
+def get_family_state(family_id):
+    """
+    Return the cached state of the family, loading it from the database
+    on a cache miss, or None if there is no such family
+    """
+    state = cache.get(family_cache_key(family_id))
+    if state is None:
+        row = RefreshTokenFamily.objects.filter(pk=family_id).values_list(
+            'current_jti', 'revoked'
+        ).first()
+        if row is None:
+            return None
+        state = REVOKED if row[1] else row[0]
+        cache_family_state(family_id, state)
+    return state
+
+
+def revoke_family(family_id):
+    RefreshTokenFamily.objects.filter(pk=family_id).update(revoked=True)
+    cache_family_state(family_id, REVOKED)
+
+
+class FamilyRefreshToken(RefreshToken):
+    """
+    Refresh token that belongs to a family of rotated tokens. Revocation
+    is checked against the cached family state instead of the blacklist
+    table, and reusing a rotated token revokes the whole family.
+    """
+    no_copy_claims = RefreshToken.no_copy_claims + (FAMILY_CLAIM,)
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Start a new family for a fresh login
+        """
+        token = super().for_user(user)
+        family = RefreshTokenFamily.objects.create(
+            user=user,
+            current_jti=token[api_settings.JTI_CLAIM]
+        )
+        token[FAMILY_CLAIM] = str(family.pk)
+        cache_family_state(family.pk, token[api_settings.JTI_CLAIM])
+
+        return token
+
+    def check_blacklist(self):
+        if FAMILY_CLAIM not in self.payload:
+            # issued before token families existed
+            if prepared.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+                raise TokenError(_('Token is blacklisted'))
+            return
+
+        state = get_family_state(self.payload[FAMILY_CLAIM])
+        if state is None or state == REVOKED:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        """
+        Blacklist the token and revoke its family, e.g. on logout
+        """
+        if FAMILY_CLAIM in self.payload:
+            revoke_family(self.payload[FAMILY_CLAIM])
+        return super().blacklist()
+
+    def rotate(self):
+        """
+        Return the next refresh token of the family. The only write is a
+        conditional UPDATE of the family, so of two concurrent rotations
+        of one token only one succeeds. Reuse is decided by the database
+        row, the cached state may lag behind in other processes.
+        """
+        family_id = self.payload[FAMILY_CLAIM]
+        jti = self.payload[api_settings.JTI_CLAIM]
+
+        token = FamilyRefreshToken()
+        for claim, value in self.payload.items():
+            if claim not in RefreshToken.no_copy_claims:
+                token[claim] = value
+
+        rotated = RefreshTokenFamily.objects.filter(
+            pk=family_id,
+            current_jti=jti,
+            revoked=False
+        ).update(
+            current_jti=token[api_settings.JTI_CLAIM],
+            rotated_at=timezone.now()
+        )
+        if not rotated:
+            # an already rotated token is used again, it may be stolen
+            revoke_family(family_id)
+            raise TokenError(_('Token has already been used'))
+        cache_family_state(family_id, token[api_settings.JTI_CLAIM])
+
+        return token
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from core import metrics as metrics_store
+
+
+def metrics_allowed(request):
+    """
+    Scrapers come from METRICS_ALLOWED_IPS or send METRICS_TOKEN as a
+    bearer token, with neither configured nobody gets the metrics
+    """
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token
+    )
+
+
+def metrics(request):
+    """
+    Metrics of all worker processes in Prometheus text format
+    """
+    if not metrics_allowed(request):
+        raise Http404()
+    return HttpResponse(
+        metrics_store.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
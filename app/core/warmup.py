@@ -0,0 +1,107 @@
+import logging
+import os
+
+from django.core.signals import request_started
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core import prepared
+
+logger = logging.getLogger(__name__)
+
+
+def iter_callbacks(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_callbacks(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def serializer_classes(resolver):
+    """
+    Serializer classes of the DRF views routed by the resolver, including
+    those set on viewset actions
+    """
+    classes = set()
+    for callback in iter_callbacks(resolver.url_patterns):
+        initkwargs = getattr(callback, 'initkwargs', None) or {}
+        for serializer_class in (
+            initkwargs.get('serializer_class'),
+            getattr(getattr(callback, 'cls', None), 'serializer_class', None),
+        ):
+            if serializer_class is not None:
+                classes.add(serializer_class)
+    return classes
+
+
+def warm_up_connections():
+    """
+    Connect to databases with persistent connections and prepare their
+    statements. Connections with CONN_MAX_AGE 0 would be closed by the
+    first request, they are left alone.
+    """
+    for alias in connections:
+        connection = connections[alias]
+        if connection.settings_dict['CONN_MAX_AGE'] == 0:
+            continue
+        connection.ensure_connection()
+        if prepared.enabled(connection):
+            for name in prepared.STATEMENTS:
+                prepared.prepare(connection, name)
+
+
+def warm_up():
+    """
+    Do the work the first requests of a worker would otherwise pay for:
+    open connections, build the URL resolver's reverse lookup tables and
+    the fields of every serializer.
+
+    Run it in the worker process, connections opened before a fork
+    must not be shared by several workers, see warm_up_process().
+    """
+    warm_up_connections()
+
+    resolver = get_resolver()
+    # populated on first access
+    resolver.reverse_dict
+
+    for serializer_class in serializer_classes(resolver):
+        serializer_class().fields
+
+    logger.info('Worker warmed up')
+
+
+# set once the process handles requests, it is a worker then
+_serving = False
+
+
+def _mark_serving(**kwargs):
+    global _serving
+    _serving = True
+
+
+def _before_fork():
+    # a preforking master hands no connection to its workers
+    if not _serving:
+        connections.close_all()
+
+
+def _after_fork_in_child():
+    if not _serving:
+        warm_up_connections()
+
+
+def warm_up_process():
+    """
+    Warm up when the WSGI application is loaded, wherever that happens.
+    Servers importing it in every worker (gunicorn without --preload,
+    uWSGI with lazy-apps) keep the connections. Servers importing it in
+    a master that forks the workers (gunicorn --preload, uWSGI without
+    lazy-apps) close them before every fork and each worker connects
+    afresh. Once a process handles requests, its forks, e.g. by
+    multiprocessing, leave its connections alone.
+    """
+    warm_up()
+    request_started.connect(_mark_serving, dispatch_uid='warmup-serving')
+    os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
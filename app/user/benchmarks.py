@@ -0,0 +1,176 @@
+import io
+import itertools
+
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmark import register
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from user.emails import render_email
+from user.serializers import UserSerializer, LoginSerializer
+
+
+# cases run inside a transaction that the benchmark command rolls back,
+# so they are free to write to the database
+
+PASSWORD = 'benchpass123'
+
+_counter = itertools.count()
+
+
+def bench_user(verified=True):
+    return get_user_model().objects.create_user(
+        email='bench-{}@example.com'.format(next(_counter)),
+        password=PASSWORD,
+        name='Bench user',
+        is_verified=verified,
+    )
+
+
+@register('user.serializer.create')
+def serializer_create():
+    def run():
+        serializer = UserSerializer(data={
+            'email': 'bench-{}@example.com'.format(next(_counter)),
+            'password': PASSWORD,
+            'name': 'Bench user',
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    return run
+
+
+@register('user.serializer.update')
+def serializer_update():
+    user = bench_user()
+
+    def run():
+        serializer = UserSerializer(
+            user,
+            data={'email': user.email, 'name': 'Renamed'},
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+    return run
+
+
+@register('user.login.validate')
+def login_validate():
+    user = bench_user()
+
+    def run():
+        serializer = LoginSerializer(
+            data={'email': user.email, 'password': PASSWORD},
+            context={'request': None}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.data
+    return run
+
+
+@register('user.token.for_user')
+def refresh_token_for_user():
+    user = bench_user()
+
+    def run():
+        str(RefreshToken.for_user(user))
+    return run
+
+
+@register('user.token.verify_decode')
+def verify_email_decode():
+    token = str(RefreshToken.for_user(bench_user(verified=False)).access_token)
+
+    def run():
+        jwt.decode(jwt=token, key=settings.SECRET_KEY, algorithms=['HS256'])
+    return run
+
+
+@register('user.password_reset.make_token')
+def password_reset_make_token():
+    user = bench_user()
+    generator = PasswordResetTokenGenerator()
+
+    def run():
+        generator.make_token(user)
+    return run
+
+
+@register('user.password_reset.check_token')
+def password_reset_check_token():
+    user = bench_user()
+    generator = PasswordResetTokenGenerator()
+    token = generator.make_token(user)
+
+    def run():
+        generator.check_token(user, token)
+    return run
+
+
+@register('user.email.render')
+def email_render():
+    context = {'name': 'Bench user', 'url': 'https://trainingapp.com/api/user/email-verify/?token=x'}
+
+    def run():
+        render_email('verify_email', 'bench@example.com', context)
+    return run
+
+
+def list_payload(size=500):
+    """ UserListViewSet response data for size users """
+    get_user_model().objects.bulk_create([
+        get_user_model()(
+            email='bench-list-{}@example.com'.format(number),
+            name='Bench user {}'.format(number),
+            password='!'
+        )
+        for number in range(size)
+    ])
+    return UserSerializer(get_user_model().objects.all(), many=True).data
+
+
+@register('user.render.list.drf')
+def render_list_drf():
+    data = list_payload()
+    renderer = JSONRenderer()
+
+    def run():
+        renderer.render(data)
+    return run
+
+
+@register('user.render.list.fast')
+def render_list_fast():
+    data = list_payload()
+    renderer = FastJSONRenderer()
+
+    def run():
+        renderer.render(data)
+    return run
+
+
+@register('user.parse.list.drf')
+def parse_list_drf():
+    content = JSONRenderer().render(list_payload())
+    parser = JSONParser()
+
+    def run():
+        parser.parse(io.BytesIO(content))
+    return run
+
+
+@register('user.parse.list.fast')
+def parse_list_fast():
+    content = JSONRenderer().render(list_payload())
+    parser = FastJSONParser()
+
+    def run():
+        parser.parse(io.BytesIO(content))
+    return run
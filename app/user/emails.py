@@ -0,0 +1,125 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.contrib.sites.shortcuts import get_current_site
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.encoding import smart_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .utils import Util
+
+
+# email name -> subject, bodies are in user/email/<name>.txt and .html
+SUBJECTS = {
+    'verify_email': 'Verify your email',
+    'password_reset': 'Reset your password',
+}
+
+_base_urls = {}
+
+
+@lru_cache(maxsize=None)
+def get_email_templates(name):
+    """
+    Return compiled text and html templates of the email,
+    loaded once per process
+    """
+    return (
+        get_template('user/email/{}.txt'.format(name)),
+        get_template('user/email/{}.html'.format(name)),
+    )
+
+
+def get_base_url(request=None):
+    """
+    Return scheme and domain that links in emails point to, from
+    EMAIL_BASE_URL or else from the request, cached per requested host
+    """
+    if settings.EMAIL_BASE_URL:
+        return settings.EMAIL_BASE_URL.rstrip('/')
+
+    key = (request.scheme, request.get_host())
+    if key not in _base_urls:
+        _base_urls[key] = request.scheme + '://' + get_current_site(request).domain
+    return _base_urls[key]
+
+
+def render_email(name, to_email, context):
+    """
+    Render the email into the data dict accepted by Util.send_email
+    """
+    text_template, html_template = get_email_templates(name)
+    return {
+        'email_body': text_template.render(context).strip(),
+        'email_html': html_template.render(context),
+        'to_email': to_email,
+        'email_subject': SUBJECTS[name],
+    }
+
+
+def render_batch(name, recipients):
+    """
+    Render the email for many (to_email, context) pairs
+    """
+    return [render_email(name, to_email, context) for to_email, context in recipients]
+
+
+def verify_email_context(user, base_url):
+    """
+    Context of the verification email, the link carries an access token
+    """
+    token = AccessToken.for_user(user)
+    return {
+        'name': user.name,
+        'url': base_url + reverse('user:email-verify') + '?token=' + str(token),
+    }
+
+
+def password_reset_context(user, base_url):
+    """
+    Context of the password reset email with uidb64 and token in the link
+    """
+    relative_link = reverse(
+        'user:password-reset-confirm',
+        kwargs={
+            'uidb64': urlsafe_base64_encode(smart_bytes(user.id)),
+            'token': PasswordResetTokenGenerator().make_token(user),
+        }
+    )
+    return {'url': base_url + relative_link}
+
+
+def send_email_verify_batch(users, request):
+    """
+    Queue verification emails to the users as one batch, return how
+    many were queued
+    """
+    base_url = get_base_url(request)
+    messages = render_batch('verify_email', [
+        (user.email, verify_email_context(user, base_url))
+        for user in users
+    ])
+    if messages:
+        Util.queue_emails(messages)
+    return len(messages)
+
+
+def resend_email_verify(queryset, request):
+    """
+    Queue verification emails to the active unverified users of the queryset
+    """
+    return send_email_verify_batch(
+        queryset.filter(is_active=True, is_verified=False), request
+    )
+
+
+def send_password_reset(user, base_url):
+    """
+    Make the reset token, render and send the email, in the background
+    so the request does the same work whether the account exists or not
+    """
+    context = password_reset_context(user, base_url)
+    Util.send_email(render_email('password_reset', user.email, context))
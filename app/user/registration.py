@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from core import metrics
+from core.timing import timed
+
+from .serializers import BulkRegisterItemSerializer
+from .utils import get_hash_executor
+
+
+def validate_items(items):
+    """
+    Validate every item and return (results, valid), results hold the
+    errors by item index and valid the (index, validated data) pairs
+    """
+    results = {}
+    valid = []
+    seen = set()
+    normalize_email = get_user_model().objects.normalize_email
+
+    for index, item in enumerate(items):
+        serializer = BulkRegisterItemSerializer(data=item)
+        if not serializer.is_valid():
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+            continue
+        data = dict(serializer.validated_data)
+        data['email'] = normalize_email(data['email'])
+        if data['email'] in seen:
+            results[index] = duplicate_error(index)
+            continue
+        seen.add(data['email'])
+        valid.append((index, data))
+
+    return results, valid
+
+
+def duplicate_error(index):
+    return {
+        'index': index,
+        'status': 'error',
+        'errors': {'email': ['user with this email already exists.']},
+    }
+
+
+def drop_existing(valid, results):
+    """
+    Move items whose email is taken to the errors, with one query
+    """
+    emails = [data['email'] for _, data in valid]
+    existing = set(
+        get_user_model().objects.filter(email__in=emails).values_list('email', flat=True)
+    )
+    remaining = []
+    for index, data in valid:
+        if data['email'] in existing:
+            results[index] = duplicate_error(index)
+        else:
+            remaining.append((index, data))
+    return remaining
+
+
+def insert(valid):
+    """
+    Insert the users with one bulk INSERT and return them with their ids
+    """
+    User = get_user_model()
+    users = [
+        User(email=data['email'], name=data.get('name', ''), password=data['password'])
+        for _, data in valid
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+    if users and users[0].pk is None:
+        # only some databases return the ids of bulk inserted rows
+        ids = dict(User.objects.filter(
+            email__in=[user.email for user in users]
+        ).values_list('email', 'pk'))
+        for user in users:
+            user.pk = ids[user.email]
+    return users
+
+
+def bulk_register(items):
+    """
+    Register many users: validate all items, check uniqueness of all
+    emails in one query, hash passwords in parallel and insert in one
+    statement. Return the results in item order and the created users.
+    """
+    results, valid = validate_items(items)
+    valid = drop_existing(valid, results)
+
+    passwords = [data['password'] for _, data in valid]
+    with timed('hash'):
+        hashes = list(get_hash_executor().map(make_password, passwords))
+    metrics.inc('password_hashes_total', len(hashes), operation='set')
+    for (_, data), password in zip(valid, hashes):
+        data['password'] = password
+
+    try:
+        users = insert(valid)
+    except IntegrityError:
+        # an email was registered since the check, check again once
+        valid = drop_existing(valid, results)
+        users = insert(valid)
+
+    for (index, _), user in zip(valid, users):
+        results[index] = {'index': index, 'status': 'created', 'id': user.pk, 'email': user.email}
+
+    return [results[index] for index in range(len(items))], users
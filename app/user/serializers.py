@@ -1,15 +1,31 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.translation import gettext_lazy as _
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
+from core.timing import timed
+from core.tokens import FamilyRefreshToken, FAMILY_CLAIM
 from .utils import Util
 
 
-class UserSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Serializer taking ``fields``, the names of the fields to keep,
+    for ?fields= requests
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the users object
     """
@@ -26,18 +42,20 @@ class UserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         """
-        Update a user with encrypted password and return it
+        Update a user with encrypted password and return it,
+        User.save writes only the changed columns in a single UPDATE
         """
         password = validated_data.pop('password', None)
-        email = Util.normalize_email(validated_data.pop('email', None))
-        validated_data['email'] = email
-        user = super().update(instance, validated_data)
+        if 'email' in validated_data:
+            validated_data['email'] = Util.normalize_email(validated_data['email'])
 
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+        instance.save()
 
-        return user
+        return instance
 
 
 class EmailVerificationSerializer(serializers.ModelSerializer):
@@ -66,11 +84,7 @@ class LoginSerializer(serializers.ModelSerializer):
 
     def get_tokens(self, obj):
 
-        user = get_user_model().objects.get(email=obj['email'])
-        return {
-            'access': user.tokens()['access'],
-            'refresh': user.tokens()['refresh']
-        }
+        return obj['tokens']()
 
     class Meta:
         model = get_user_model()
@@ -81,11 +95,12 @@ class LoginSerializer(serializers.ModelSerializer):
         email = attrs.get('email', '')
         password = attrs.get('password', '')
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        with timed('auth'):
+            user = authenticate(
+                request=self.context.get('request'),
+                username=email,
+                password=password
+            )
 
         if not user:
             msg3 = _('Unable to authenticate with provided credentials')
@@ -115,14 +130,6 @@ class ResetPasswordEmailSerializer(serializers.Serializer):
     class Meta:
         fields = ["email"]
 
-    def validate(self, attrs):
-
-        email = attrs.get('email', '')
-        if get_user_model().objects.filter(email=email).exists():
-            return {'email': email}
-        else:
-            raise AuthenticationFailed('Provided email is invalid.', 401)
-
 
 class SetNewPasswordSerializer(serializers.Serializer):
     """
@@ -169,7 +176,64 @@ class LogOutSerializer(serializers.Serializer):
     def save(self, **kwargs):
 
         try:
-            RefreshToken(self.token).blacklist()
+            FamilyRefreshToken(self.token).blacklist()
 
         except TokenError:
             self.fail('bad_token')
+
+
+class TokenRotateSerializer(serializers.Serializer):
+    """
+    Serializer exchanging a refresh token for a new access and refresh token
+    """
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        refresh = FamilyRefreshToken(attrs['refresh'])
+        if FAMILY_CLAIM not in refresh:
+            # tokens issued before rotation are refreshed as they were
+            return {'access': str(refresh.access_token)}
+
+        refresh = refresh.rotate()
+        return {
+            'access': str(refresh.access_token),
+            'refresh': str(refresh)
+        }
+
+
+class BulkUserActionSerializer(serializers.Serializer):
+    """
+    Serializer for bulk actions of the admin users endpoint
+    """
+    action = serializers.ChoiceField(
+        choices=('activate', 'deactivate', 'verify', 'resend_verification')
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class BulkRegisterItemSerializer(UserSerializer):
+    """
+    UserSerializer of one bulk registration item, without the per item
+    uniqueness query, all emails are checked at once
+    """
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = dict(UserSerializer.Meta.extra_kwargs, email={'validators': []})
+
+
+class BulkRegisterSerializer(serializers.Serializer):
+    """
+    Serializer for the users of a bulk registration
+    """
+    users = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_users(self, value):
+        limit = settings.USER_BULK_REGISTER_LIMIT
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                _('At most {} users can be registered at once.').format(limit)
+            )
+        return value
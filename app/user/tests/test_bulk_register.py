@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+BULK_REGISTER_URL = reverse('user:register-bulk')
+
+
+@override_settings(EMAIL_ASYNC=False)
+class TestBulkRegisterApi(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@londonappdev.com', 'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_bulk_register_returns_result_per_item(self):
+        """
+        Test valid items are created and the others get their errors
+        """
+        get_user_model().objects.create_user('taken@londonappdev.com', 'password123')
+        users = [
+            {'email': 'one@londonappdev.com', 'password': 'password123', 'name': 'One'},
+            {'email': 'two@LONDONAPPDEV.com', 'password': 'password123', 'name': 'Two'},
+            {'email': 'taken@londonappdev.com', 'password': 'password123', 'name': 'Taken'},
+            {'email': 'two@londonappdev.com', 'password': 'password123', 'name': 'Again'},
+            {'email': 'short@londonappdev.com', 'password': 'pw', 'name': 'Short'},
+        ]
+
+        res = self.client.post(BULK_REGISTER_URL, {'users': users}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 3)
+        self.assertEqual(
+            [result['status'] for result in res.data['results']],
+            ['created', 'created', 'error', 'error', 'error']
+        )
+        self.assertIn('email', res.data['results'][2]['errors'])
+        self.assertIn('email', res.data['results'][3]['errors'])
+        self.assertIn('password', res.data['results'][4]['errors'])
+
+        user = get_user_model().objects.get(email='two@londonappdev.com')
+        self.assertEqual(res.data['results'][1]['id'], user.id)
+        self.assertTrue(user.check_password('password123'))
+        self.assertFalse(user.is_verified)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['one@londonappdev.com', 'two@londonappdev.com']
+        )
+
+    def test_bulk_register_checks_emails_in_one_query(self):
+        """
+        Test uniqueness of all emails is checked with a single query
+        """
+        users = [
+            {'email': 'user{}@londonappdev.com'.format(n), 'password': 'password123',
+             'name': 'User'}
+            for n in range(10)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(BULK_REGISTER_URL, {'users': users}, format='json')
+
+        sqls = [query['sql'] for query in queries]
+        inserts = [sql for sql in sqls if sql.startswith('INSERT')]
+        checks = [sql for sql in sqls[:sqls.index(inserts[0])] if sql.startswith('SELECT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(checks), 1)
+
+        self.assertEqual(get_user_model().objects.filter(is_superuser=False).count(), 10)
+
+    @override_settings(USER_BULK_REGISTER_LIMIT=2)
+    def test_bulk_register_limit(self):
+        """
+        Test more users than USER_BULK_REGISTER_LIMIT are rejected
+        """
+        users = [
+            {'email': 'user{}@londonappdev.com'.format(n), 'password': 'password123',
+             'name': 'User'}
+            for n in range(3)
+        ]
+
+        res = self.client.post(BULK_REGISTER_URL, {'users': users}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(get_user_model().objects.filter(is_superuser=False).exists())
+
+    def test_bulk_register_allowed_with_add_user_permission(self):
+        """
+        Test partners with the add user permission register in bulk
+        without being staff
+        """
+        partner = get_user_model().objects.create_user('partner@londonappdev.com', 'password123')
+        partner.user_permissions.add(Permission.objects.get(codename='add_user'))
+        self.client.force_authenticate(partner)
+        users = [{'email': 'new@londonappdev.com', 'name': 'New', 'password': 'password123'}]
+
+        res = self.client.post(BULK_REGISTER_URL, {'users': users}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(partner.is_staff)
+
+    def test_bulk_register_requires_permission(self):
+        """
+        Test users without the add user permission cannot register in bulk
+        """
+        user = get_user_model().objects.create_user('test@londonappdev.com', 'password123')
+        self.client.force_authenticate(user)
+
+        res = self.client.post(BULK_REGISTER_URL, {'users': [{}]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,19 +1,27 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.core.cache import cache
 from unittest.mock import patch
 from django.core import mail
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from user.throttling import local_store
 
 
 def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
+@override_settings(EMAIL_ASYNC=False)
 class TestEmailApiTest(TestCase):
     """ Test sending email with token to user """
     def setUp(self):
+        # rate limit buckets and cached profiles outlive a test
+        local_store.clear()
+        cache.clear()
         self.client = APIClient()
         self.register_url = reverse('user:register')
         self.email_verify_url = reverse('user:email-verify')
@@ -65,11 +73,28 @@ class TestEmailApiTest(TestCase):
                 # fetching email body with the token (that was sent)
                 # for assertion using call_args method of path function
                 'email_body': mocked_send_email_function.call_args[0][0]['email_body'],
+                'email_html': mocked_send_email_function.call_args[0][0]['email_html'],
                 'to_email': self.user_correct_data['email'],
                 'email_subject': 'Verify your email',
                 }
             )
 
+    @override_settings(EMAIL_BASE_URL='https://trainingapp.com')
+    def test_verification_email_has_text_and_html_parts(self):
+        """
+        Test verification email is multipart with links to the base url
+        """
+        self.client.post(self.register_url, self.user_correct_data)
+
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        link = 'https://trainingapp.com' + self.email_verify_url + '?token='
+        html, mimetype = message.alternatives[0]
+        self.assertEqual(mimetype, 'text/html')
+        self.assertIn(link, message.body)
+        self.assertIn(link, html)
+        self.assertIn(self.user_correct_data['name'], html)
+
     def test_create_user_with_invalid_credentials_email_failed(self):
         """
         Test creating user with invalid credentials will fail and won`t send email
@@ -161,6 +186,7 @@ class TestEmailApiTest(TestCase):
             mocked_send_email_function.assert_called_with({
                 # fetching email body with the token (that was sent) for assertion using call_args method of path function
                 'email_body': mocked_send_email_function.call_args[0][0]['email_body'],
+                'email_html': mocked_send_email_function.call_args[0][0]['email_html'],
                 'to_email': self.user_correct_data['email'],
                 'email_subject': 'Reset your password',
                 }
@@ -168,20 +194,39 @@ class TestEmailApiTest(TestCase):
 
     def test_email_for_password_reset_was_not_sent(self):
         """
-        Test that email for password reset was not sent if email is invalid
+        Test that email for password reset was not sent if email is unknown,
+        while the response is the same as for a registered email
         """
+        create_user(email='other@londonapdev.com', password='testpass')
         with patch(
             "user.utils.Util.send_email"
         ) as mocked_send_email_function:
 
-            # email is not verified
-            response = self.client.post(
-                                    self.email_reset_url,
-                                    {'email': self.user_correct_data['email']}
-                                    )
+            with self.assertNumQueries(1):
+                response = self.client.post(
+                                        self.email_reset_url,
+                                        {'email': self.user_correct_data['email']}
+                                        )
+            known = self.client.post(self.email_reset_url, {'email': 'other@londonapdev.com'})
 
-            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
-            mocked_send_email_function.assert_not_called()
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, known.data)
+            self.assertEqual(mocked_send_email_function.call_count, 1)
+
+    @override_settings(EMAIL_ASYNC=True)
+    def test_password_reset_email_is_built_in_background(self):
+        """
+        Test the reset token and templates are not made in the request,
+        so known emails take no more work there than unknown ones
+        """
+        create_user(email='other@londonapdev.com', password='testpass')
+        with patch('user.utils.get_email_executor') as mocked_executor, \
+                patch('user.emails.password_reset_context') as mocked_context:
+            response = self.client.post(self.email_reset_url, {'email': 'other@londonapdev.com'})
+
+            mocked_context.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mocked_executor.return_value.submit.call_count, 1)
 
     def test_verifying_correct_sent_token_succeed(self):
         """
@@ -272,9 +317,9 @@ class TestEmailApiTest(TestCase):
 
             self.assertEqual(response3.status_code, status.HTTP_200_OK)
 
-    def test_sending_verification_to_changed_email_succeed(self):
+    def test_email_wasnt_sent_if_user_dont_change(self):
         """
-        Test that when user changed emal verification link is sent successfully
+        Test that email for verification was not sent if user did not change email
         """
         with patch(
             "user.utils.Util.send_email"
@@ -288,21 +333,59 @@ class TestEmailApiTest(TestCase):
             response2 = self.client.post(self.login_url, self.user_correct_data)
             self.client.force_authenticate(user=user)
 
-            payload = {'email': 'newemail@gmail.com', 'name': 'new name', 'password': 'newpassword123'}
+            payload = {'name': 'new name', 'password': 'newpassword123'}
             response3 = self.client.patch(self.update_user_url, payload)
 
+            # expect function to be called 1 time when user is registered
             mocked_send_email_function.assert_called_with({
                 # fetching email body with the token (that was sent)
                 # for assertion using call_args method of path function
                 'email_body': mocked_send_email_function.call_args[0][0]['email_body'],
-                'to_email': payload['email'],
+                'email_html': mocked_send_email_function.call_args[0][0]['email_html'],
+                'to_email': self.user_correct_data['email'],
                 'email_subject': 'Verify your email',
                 }
                 )
 
-    def test_email_wasnt_sent_if_user_dont_change(self):
+    def test_verifying_email_is_single_update_and_idempotent(self):
         """
-        Test that email for verification was not sent if user did not change email
+        Test verification is one UPDATE and repeated links skip the db
+        """
+        user = create_user(**self.user_correct_data)
+        token = str(RefreshToken.for_user(user).access_token)
+        url = self.email_verify_url + '?token=' + token
+
+        with self.assertNumQueries(1):
+            response1 = self.client.get(url)
+        with self.assertNumQueries(0):
+            response2 = self.client.get(url)
+
+        user.refresh_from_db()
+        self.assertTrue(user.is_verified)
+        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+        self.assertEqual(response2.status_code, status.HTTP_200_OK)
+
+
+class TestEmailOnCommitApiTest(TransactionTestCase):
+    """
+    Test emails that are only sent once the transaction is committed
+    """
+    def setUp(self):
+        local_store.clear()
+        self.client = APIClient()
+        self.register_url = reverse('user:register')
+        self.login_url = reverse('user:login')
+        self.update_user_url = reverse('user:update')
+
+        self.user_correct_data = {
+            'email': 'test@londonapdev.com',
+            'password': 'testpass',
+            'name': 'Test name'
+        }
+
+    def test_sending_verification_to_changed_email_succeed(self):
+        """
+        Test that when user changed emal verification link is sent successfully
         """
         with patch(
             "user.utils.Util.send_email"
@@ -316,15 +399,15 @@ class TestEmailApiTest(TestCase):
             response2 = self.client.post(self.login_url, self.user_correct_data)
             self.client.force_authenticate(user=user)
 
-            payload = {'name': 'new name', 'password': 'newpassword123'}
+            payload = {'email': 'newemail@gmail.com', 'name': 'new name', 'password': 'newpassword123'}
             response3 = self.client.patch(self.update_user_url, payload)
 
-            # expect function to be called 1 time when user is registered
             mocked_send_email_function.assert_called_with({
                 # fetching email body with the token (that was sent)
                 # for assertion using call_args method of path function
                 'email_body': mocked_send_email_function.call_args[0][0]['email_body'],
-                'to_email': self.user_correct_data['email'],
+                'email_html': mocked_send_email_function.call_args[0][0]['email_html'],
+                'to_email': payload['email'],
                 'email_subject': 'Verify your email',
                 }
                 )
@@ -0,0 +1,158 @@
+import warnings
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import throttling
+
+
+THROTTLE_RATES = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '100/min',
+        'login_email': '2/min',
+        'password_reset_ip': '1/min',
+        'password_reset_email': None,
+    },
+    'NUM_PROXIES': 0,
+}
+
+
+@override_settings(REST_FRAMEWORK=THROTTLE_RATES)
+class TestThrottling(TestCase):
+    """
+    Test token bucket throttling of the expensive auth endpoints
+    """
+    def setUp(self):
+        throttling.local_store.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.login_url = reverse('user:login')
+        self.email_reset_url = reverse('user:request-reset-email')
+        get_user_model().objects.create_user(
+            email='test@londonapdev.com', password='testpass', is_verified=True
+        )
+
+    def login(self, email):
+        return self.client.post(self.login_url, {'email': email, 'password': 'wrong'})
+
+    def test_login_throttled_by_email_before_authenticate(self):
+        """
+        Test login is rejected by email rate before any password hashing
+        """
+        self.assertEqual(self.login('test@londonapdev.com').status_code, status.HTTP_401_UNAUTHORIZED)
+        # case variants of the address share one bucket
+        self.assertEqual(self.login('TEST@londonapdev.com').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        before = throttling.get_rejected_counts().get('login_email', 0)
+        with patch('user.serializers.authenticate') as mocked_authenticate:
+            res = self.login('Test@LondonApDev.com')
+
+            mocked_authenticate.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        self.assertEqual(throttling.get_rejected_counts()['login_email'], before + 1)
+
+        # other addresses are not affected
+        self.assertEqual(self.login('other@londonapdev.com').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_reset_throttled_by_ip(self):
+        """
+        Test password reset is rejected by IP rate without touching the db
+        """
+        self.client.post(self.email_reset_url, {'email': 'nobody@londonapdev.com'})
+
+        with self.assertNumQueries(0):
+            res = self.client.post(self.email_reset_url, {'email': 'test@londonapdev.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_does_not_change_ip_bucket(self):
+        """
+        Test clients cannot get a fresh IP bucket by sending their own
+        X-Forwarded-For header
+        """
+        self.client.post(
+            self.email_reset_url, {'email': 'nobody@londonapdev.com'},
+            HTTP_X_FORWARDED_FOR='10.0.0.1'
+        )
+        res = self.client.post(
+            self.email_reset_url, {'email': 'nobody@londonapdev.com'},
+            HTTP_X_FORWARDED_FOR='10.0.0.2'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(USER_THROTTLE_BACKEND='cache')
+    def test_cache_backend_shares_buckets(self):
+        """
+        Test the cache backend keeps buckets out of process memory
+        """
+        self.login('test@londonapdev.com')
+        self.login('test@londonapdev.com')
+
+        self.assertEqual(self.login('test@londonapdev.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(throttling.local_store.buckets, {})
+
+    @override_settings(USER_THROTTLE_BACKEND='cache')
+    def test_cache_keys_are_safe_for_any_email(self):
+        """
+        Test emails with spaces, control characters or of any length give
+        keys memcached accepts, the requests are throttled not failed
+        """
+        email = 'a b\x01' + 'x' * 300 + '@londonapdev.com'
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            statuses = [self.login(email).status_code for _ in range(3)]
+
+        self.assertEqual(statuses[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(USER_THROTTLE_ENABLED=False)
+    def test_throttling_can_be_disabled(self):
+        """
+        Test no request is rejected when throttling is disabled
+        """
+        for _ in range(3):
+            self.assertEqual(self.login('test@londonapdev.com').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestLocalBucketStore(SimpleTestCase):
+    """
+    Test pruning of in-process token buckets
+    """
+    def setUp(self):
+        self.store = throttling.LocalBucketStore()
+
+    def test_prune_keeps_drained_buckets_of_slow_rates(self):
+        """
+        Test a drained bucket of a slow rate survives pruning triggered
+        by a request of a fast rate
+        """
+        self.store.max_entries = 4
+        for _ in range(3):
+            self.store.consume('slow', 3, 3 / 3600, 0)
+        for key in ('a', 'b', 'c'):
+            self.store.consume(key, 30, 30 / 60, 10)
+        # the store is full, the fast buckets are full again by now
+        self.store.consume('d', 30, 30 / 60, 20)
+
+        self.assertNotIn('a', self.store.buckets)
+        self.assertIsNotNone(self.store.consume('slow', 3, 3 / 3600, 30))
+
+    def test_size_is_bounded(self):
+        """
+        Test the store never grows past max_entries
+        """
+        self.store.max_entries = 10
+        for n in range(50):
+            self.store.consume(n, 1, 1 / 3600, 0)
+
+        self.assertLessEqual(len(self.store.buckets), 10)
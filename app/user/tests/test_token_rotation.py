@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import RefreshTokenFamily
+from core.tokens import cache_family_state
+from user.throttling import local_store
+
+
+class TestTokenRotation(TestCase):
+    """
+    Test rotation of refresh tokens with reuse detection
+    """
+    def setUp(self):
+        local_store.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.login_url = reverse('user:login')
+        self.logout_url = reverse('user:logout')
+        self.refresh_url = reverse('user:token_refresh')
+
+        self.user_correct_data = {
+            'email': 'test@londonapdev.com',
+            'password': 'testpass',
+        }
+        self.user = get_user_model().objects.create_user(
+            is_verified=True, **self.user_correct_data
+        )
+        res = self.client.post(self.login_url, self.user_correct_data)
+        self.tokens = res.data['tokens']
+
+    def refresh(self, token):
+        return self.client.post(self.refresh_url, {'refresh': token})
+
+    def test_login_starts_one_family(self):
+        """
+        Test login issues a single token pair and family
+        """
+        self.assertEqual(RefreshTokenFamily.objects.filter(user=self.user).count(), 1)
+
+    def test_refresh_rotates_with_single_write(self):
+        """
+        Test refresh returns a new refresh token with one write and no reads
+        """
+        with CaptureQueriesContext(connection) as queries:
+            res = self.refresh(self.tokens['refresh'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], self.tokens['refresh'])
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('UPDATE'))
+
+        # the new token can be rotated again
+        self.assertEqual(self.refresh(res.data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_reusing_rotated_token_revokes_family(self):
+        """
+        Test reuse of a rotated token revokes the tokens rotated from it
+        """
+        rotated = self.refresh(self.tokens['refresh']).data['refresh']
+
+        reused = self.refresh(self.tokens['refresh'])
+
+        self.assertEqual(reused.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(rotated).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(RefreshTokenFamily.objects.get(user=self.user).revoked)
+
+    def test_revocation_is_read_from_db_on_cache_miss(self):
+        """
+        Test database stays the source of truth when the cache is empty
+        """
+        rotated = self.refresh(self.tokens['refresh']).data['refresh']
+        cache.clear()
+
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, status.HTTP_401_UNAUTHORIZED)
+        cache.clear()
+        self.assertEqual(self.refresh(rotated).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stale_cached_state_does_not_revoke_family(self):
+        """
+        Test a refresh is accepted when another process rotated the token
+        and the cache of this one still holds the previous jti
+        """
+        family = RefreshTokenFamily.objects.get(user=self.user)
+        old_jti = family.current_jti
+        rotated = self.refresh(self.tokens['refresh']).data['refresh']
+        cache_family_state(family.pk, old_jti)
+
+        res = self.refresh(rotated)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(RefreshTokenFamily.objects.get(pk=family.pk).revoked)
+
+    def test_logout_revokes_family(self):
+        """
+        Test refresh tokens of the family are rejected after logout
+        """
+        rotated = self.refresh(self.tokens['refresh']).data
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + rotated['access'])
+
+        res = self.client.post(self.logout_url, {'refresh': rotated['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.refresh(rotated['refresh']).status_code, status.HTTP_401_UNAUTHORIZED)
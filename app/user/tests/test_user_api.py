@@ -1,9 +1,17 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework.test import APIClient
 from rest_framework import status
+
+from core.cache import profile_cache_key
+from user.throttling import local_store
 from rest_framework.test import force_authenticate
 
 
@@ -17,6 +25,9 @@ class TestUserApi(TestCase):
     """
 
     def setUp(self):
+        # rate limit buckets and cached profiles outlive a test
+        local_store.clear()
+        cache.clear()
         self.client = APIClient()
         self.register_url = reverse('user:register')
         self.login_url = reverse('user:login')
@@ -215,3 +226,143 @@ class TestUserApi(TestCase):
         response3 = self.client.post(self.logout_user_url, {'refresh': response2.data['tokens']['refresh']})
 
         self.assertEqual(response3.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_retrieve_profile_makes_no_queries(self):
+        """
+        Test retrieving profile reuses the authenticated user
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(self.update_user_url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_profile_writes_changed_columns_once(self):
+        """
+        Test updating profile issues a single UPDATE of changed columns
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(self.update_user_url, {'name': 'new name'})
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"name"', updates[0])
+        self.assertNotIn('"password"', updates[0])
+        user.refresh_from_db()
+        self.assertEqual(user.email, self.user_correct_data['email'])
+
+    def test_retrieve_profile_not_modified(self):
+        """
+        Test profile polls with a matching ETag get 304 without a query
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+        res = self.client.get(self.update_user_url)
+        etag = res['ETag']
+
+        with self.assertNumQueries(0), \
+                patch('user.serializers.UserSerializer.to_representation') as mocked:
+            res = self.client.get(self.update_user_url, HTTP_IF_NONE_MATCH=etag)
+
+            mocked.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_retrieve_profile_modified_since(self):
+        """
+        Test If-Modified-Since is answered from updated_at
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+        last_modified = self.client.get(self.update_user_url)['Last-Modified']
+
+        res = self.client.get(self.update_user_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_profile_sparse_fields(self):
+        """
+        Test ?fields= trims the profile and gets an ETag of its own
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+        full = self.client.get(self.update_user_url)
+
+        res = self.client.get(self.update_user_url, {'fields': 'name'})
+
+        self.assertEqual(res.data, {'name': self.user_correct_data['name']})
+        self.assertNotEqual(res['ETag'], full['ETag'])
+        self.assertEqual(
+            self.client.get(self.update_user_url).data, full.data
+        )
+
+    def test_retrieve_profile_unknown_field_fails(self):
+        """
+        Test asking for a field that is not shown returns 400
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(self.update_user_url, {'fields': 'name,password'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestUserProfileCache(TransactionTestCase):
+    """
+    Test cached profiles, which are invalidated once changes commit
+    """
+
+    def setUp(self):
+        local_store.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.update_user_url = reverse('user:update')
+        self.user_correct_data = {
+            'email': 'test@londonapdev.com',
+            'password': 'testpass',
+            'name': 'Test name'
+        }
+
+    def test_retrieve_profile_is_cached_until_user_changes(self):
+        """
+        Test profile is served from cache and invalidated on save and delete
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+        self.client.get(self.update_user_url)
+
+        with patch('user.serializers.UserSerializer.to_representation') as mocked:
+            res = self.client.get(self.update_user_url)
+
+            mocked.assert_not_called()
+        self.assertEqual(res.data['name'], self.user_correct_data['name'])
+
+        self.client.patch(self.update_user_url, {'name': 'new name'})
+        res = self.client.get(self.update_user_url)
+        self.assertEqual(res.data['name'], 'new name')
+
+        user.delete()
+        self.assertIsNone(cache.get(profile_cache_key(user.id)))
+
+
+    def test_retrieve_profile_changed_etag_after_update(self):
+        """
+        Test the old ETag does not match once the profile changed
+        """
+        user = create_user(**self.user_correct_data)
+        self.client.force_authenticate(user=user)
+        etag = self.client.get(self.update_user_url)['ETag']
+
+        self.client.patch(self.update_user_url, {'name': 'new name'})
+        res = self.client.get(self.update_user_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['name'], 'new name')
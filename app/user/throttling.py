@@ -0,0 +1,183 @@
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+from .utils import Util
+
+
+_rejected = Counter()
+_rejected_lock = threading.Lock()
+
+
+def get_rejected_counts():
+    """
+    Return how many requests were rejected in this process, by rate name
+    """
+    with _rejected_lock:
+        return dict(_rejected)
+
+
+class LocalBucketStore:
+    """
+    Token buckets kept in process memory, for single node deployments.
+    Every bucket remembers when it is full again, so buckets of any rate
+    are dropped once they hold no state. When max_entries is reached,
+    full buckets are dropped and then the least recently used ones,
+    down to nine tenths of max_entries so the scan is not repeated
+    for every new key.
+    """
+    max_entries = 10000
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now):
+        """
+        Take one token from the bucket, return how long to wait
+        for the next token or None if the request is allowed
+        """
+        with self.lock:
+            tokens, stamp, _ = self.buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill_rate)
+            if tokens < 1:
+                self.store(key, tokens, capacity, refill_rate, now)
+                return (1 - tokens) / refill_rate
+            self.store(key, tokens - 1, capacity, refill_rate, now)
+            return None
+
+    def store(self, key, tokens, capacity, refill_rate, now):
+        if key not in self.buckets and len(self.buckets) >= self.max_entries:
+            self.prune(now)
+        self.buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+        self.buckets.move_to_end(key)
+
+    def prune(self, now):
+        for key, (_, _, full_at) in list(self.buckets.items()):
+            if full_at <= now:
+                del self.buckets[key]
+        while len(self.buckets) > self.max_entries * 9 // 10:
+            self.buckets.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in a shared cache, for multi node deployments.
+    Read and write are not atomic, so concurrent nodes may let through
+    a few extra requests at the edge of the limit.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, refill_rate, now):
+        tokens, stamp = self.cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * refill_rate)
+        # the bucket is full again after this time, no need to keep it longer
+        timeout = int(capacity / refill_rate) + 1
+        if tokens < 1:
+            self.cache.set(key, (tokens, now), timeout)
+            return (1 - tokens) / refill_rate
+        self.cache.set(key, (tokens - 1, now), timeout)
+        return None
+
+    def clear(self):
+        self.cache.clear()
+
+
+local_store = LocalBucketStore()
+
+
+def get_store():
+    if getattr(settings, 'USER_THROTTLE_BACKEND', 'local') == 'cache':
+        return CacheBucketStore(
+            getattr(settings, 'USER_THROTTLE_CACHE_ALIAS', 'default')
+        )
+    return local_store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle using rates from DEFAULT_THROTTLE_RATES,
+    named after the view ``throttle_scope`` and the throttle ``kind``.
+    A rate of '5/min' gives a bucket of 5 tokens refilled over a minute.
+    """
+    kind = None
+    durations = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+    def get_rate_name(self, view):
+        return '{}_{}'.format(getattr(view, 'throttle_scope', None), self.kind)
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        return int(num), self.durations[period[0]]
+
+    def get_key(self, request, view):
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def allow_request(self, request, view):
+        if not getattr(settings, 'USER_THROTTLE_ENABLED', True):
+            return True
+        name = self.get_rate_name(view)
+        # rates are looked up on every call so tests can override them
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(name)
+        if rate is None:
+            return True
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+
+        capacity, duration = self.parse_rate(rate)
+        # keys come from user input, hashed they are safe for any cache
+        # backend, e.g. memcached rejects spaces and keys over 250 bytes
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        self.wait_time = get_store().consume(
+            'throttle:{}:{}'.format(name, digest),
+            capacity, capacity / duration, time.time()
+        )
+        if self.wait_time is None:
+            return True
+
+        with _rejected_lock:
+            _rejected[name] += 1
+        metrics.inc('throttled_requests_total', rate=name)
+        return False
+
+    def wait(self):
+        return getattr(self, 'wait_time', None)
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Throttle by client IP address
+    """
+    kind = 'ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(TokenBucketThrottle):
+    """
+    Throttle by the email in the request body, lowercased so case
+    variants of one address share a bucket
+    """
+    kind = 'email'
+
+    def get_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not email or not isinstance(email, str):
+            return None
+        return Util.normalize_email(email).lower()
@@ -1,16 +1,133 @@
-from django.core.mail import EmailMessage
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from core import metrics
+from core.timing import timed
+
+
+logger = logging.getLogger(__name__)
+
+_email_executor = None
+_hash_executor = None
+
+
+def get_email_executor():
+    """
+    Return the process wide pool of threads sending queued emails
+    """
+    global _email_executor
+    if _email_executor is None:
+        _email_executor = ThreadPoolExecutor(
+            max_workers=settings.EMAIL_ASYNC_WORKERS,
+            thread_name_prefix='email'
+        )
+    return _email_executor
+
+
+def get_hash_executor():
+    """
+    Return the process wide pool of threads hashing passwords of bulk
+    registrations, PBKDF2 releases the GIL so they run in parallel
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.USER_BULK_REGISTER_HASH_WORKERS,
+            thread_name_prefix='hash'
+        )
+    return _hash_executor
 
 
 class Util:
     @staticmethod
-    def send_email(data):
-
-        email = EmailMessage(
+    def build_email(data, connection=None):
+        """
+        Build a message with a text body and html alternative if given
+        """
+        email = EmailMultiAlternatives(
             subject=data['email_subject'],
             body=data['email_body'],
-            to=[data['to_email']]
+            to=[data['to_email']],
+            connection=connection
         )
-        email.send()
+        if data.get('email_html'):
+            email.attach_alternative(data['email_html'], 'text/html')
+        return email
+
+    @staticmethod
+    def send_email(data):
+
+        with timed('email'):
+            Util.build_email(data).send()
+        metrics.inc('emails_sent_total')
+
+    @staticmethod
+    def send_emails(messages):
+        """
+        Send many emails over a single connection
+        """
+        connection = get_connection()
+        with timed('email'):
+            sent = connection.send_messages(
+                [Util.build_email(data, connection) for data in messages]
+            )
+        metrics.inc('emails_sent_total', sent or 0)
+
+    @staticmethod
+    def queue_email(data):
+        """
+        Send the email from a background thread so the request does not
+        wait for SMTP, or right away if EMAIL_ASYNC is turned off
+        """
+        if not settings.EMAIL_ASYNC:
+            Util.send_email(data)
+            return
+        get_email_executor().submit(Util._send_email_logged, data)
+
+    @staticmethod
+    def queue_emails(messages):
+        """
+        Send a batch of emails from a background thread
+        """
+        if not settings.EMAIL_ASYNC:
+            Util.send_emails(messages)
+            return
+        get_email_executor().submit(Util._send_emails_logged, messages)
+
+    @staticmethod
+    def queue_task(func, *args):
+        """
+        Run func in the email threads, to render and send an email there,
+        or right away if EMAIL_ASYNC is turned off
+        """
+        if not settings.EMAIL_ASYNC:
+            func(*args)
+            return
+        get_email_executor().submit(Util._run_logged, func, *args)
+
+    @staticmethod
+    def _run_logged(func, *args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Email task %s failed', func.__name__)
+
+    @staticmethod
+    def _send_email_logged(data):
+        try:
+            Util.send_email(data)
+        except Exception:
+            logger.exception('Sending email to %s failed', data['to_email'])
+
+    @staticmethod
+    def _send_emails_logged(messages):
+        try:
+            Util.send_emails(messages)
+        except Exception:
+            logger.exception('Sending %d emails failed', len(messages))
 
     @staticmethod
     def normalize_email(email):
@@ -1,53 +1,105 @@
 from rest_framework import generics, status, permissions, views, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
 from django.shortcuts import get_object_or_404
-from django.contrib.sites.shortcuts import get_current_site
-from django.urls import reverse
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.http import http_date, urlsafe_base64_decode
+import hashlib
 import jwt
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control,
+                                patch_vary_headers)
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from core.cache import profile_cache_key
+from core.deletion import request_deletion
+from . import emails
+from .registration import bulk_register
 from .utils import Util
+from .throttling import IPRateThrottle, EmailRateThrottle
 from django.utils.encoding import (smart_str,
-                                   smart_bytes,
                                    DjangoUnicodeDecodeError)
 
+from rest_framework_simplejwt.views import TokenViewBase
+
 from user.serializers import (UserSerializer,
                               EmailVerificationSerializer,
                               ResetPasswordEmailSerializer,
                               SetNewPasswordSerializer,
                               LoginSerializer,
-                              LogOutSerializer
+                              LogOutSerializer,
+                              TokenRotateSerializer,
+                              BulkUserActionSerializer,
+                              BulkRegisterSerializer
                               )
 
 
-def send_email_verify(user, request, changed_email=None):
+def send_email_verify(user, request):
     """
     Sending email with link to verify user
     """
-    user = get_object_or_404(get_user_model(), email=user.email)
-
-    token = RefreshToken.for_user(user).access_token
-    current_site = get_current_site(request).domain
-    relative_link = reverse('user:email-verify')
+    context = emails.verify_email_context(user, emails.get_base_url(request))
+    Util.send_email(emails.render_email('verify_email', user.email, context))
 
-    abs_url = 'http://' + current_site + relative_link + "?token=" + str(token)
 
-    email_body = "Hello " + user.name + '!' + ' Use link below to verify your email \n' + abs_url
+class SparseFieldsViewMixin:
+    """
+    ?fields=email,name trims the serializer output of safe requests,
+    and the queryset selects only the columns of the fields shown
+    """
 
-    data = {
-        'email_body': email_body,
-        'to_email': user.email,
-        'email_subject': 'Verify your email'
-    }
-    if changed_email:
-        data['to_email'] = changed_email
+    def get_readable_fields(self):
+        serializer = self.get_serializer_class()()
+        return {
+            name: field for name, field in serializer.fields.items()
+            if not field.write_only
+        }
 
-    Util.send_email(data)
+    def get_sparse_fields(self):
+        """
+        Return the requested field names, None when all are wanted
+        """
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        param = self.request.query_params.get('fields')
+        if not param:
+            return None
+        fields = [name.strip() for name in param.split(',') if name.strip()]
+        unknown = set(fields) - set(self.get_readable_fields())
+        if unknown:
+            raise ValidationError(
+                {'fields': 'Unknown fields: {}'.format(', '.join(sorted(unknown)))}
+            )
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+
+        readable = self.get_readable_fields()
+        columns = []
+        for name in self.get_sparse_fields() or readable:
+            try:
+                field = queryset.model._meta.get_field(readable[name].source)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete:
+                columns.append(field.name)
+        return queryset.only(*columns)
 
 
 class RegisterUserView(generics.GenericAPIView):
@@ -55,6 +107,8 @@ class RegisterUserView(generics.GenericAPIView):
     Register a new user in the system
     """
     serializer_class = UserSerializer
+    throttle_classes = (IPRateThrottle, EmailRateThrottle)
+    throttle_scope = 'register'
 
     def post(self, request):
 
@@ -69,6 +123,33 @@ class RegisterUserView(generics.GenericAPIView):
         return Response(user_data, status=status.HTTP_201_CREATED)
 
 
+class BulkRegisterUserView(generics.GenericAPIView):
+    """
+    Register up to USER_BULK_REGISTER_LIMIT users in one call, for
+    partner integrations. Every item gets its own result. Partners need
+    the core.add_user permission, not staff status.
+    """
+    serializer_class = BulkRegisterSerializer
+    queryset = get_user_model().objects.all()
+    permission_classes = (permissions.DjangoModelPermissions,)
+
+    def post(self, request):
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results, users = bulk_register(serializer.validated_data['users'])
+        emails.send_email_verify_batch(users, request)
+
+        return Response(
+            {
+                'created': len(users),
+                'failed': len(results) - len(users),
+                'results': results,
+            },
+            status=status.HTTP_201_CREATED if users else status.HTTP_400_BAD_REQUEST
+        )
+
+
 class VerifyEmailView(views.APIView):
     """
     Verify a user by email with sent token
@@ -90,10 +171,16 @@ class VerifyEmailView(views.APIView):
                 key=settings.SECRET_KEY,
                 algorithms=['HS256']
                 )
-            user = get_user_model().objects.get(id=payload['user_id'])
-            if not user.is_verified:
-                user.is_verified = True
-                user.save()
+            # double clicked links and mail scanners repeat the same token,
+            # remember consumed ones so repeats never reach the database
+            consumed_key = 'email-verify:' + payload.get('jti', token)
+            if not cache.get(consumed_key):
+                # single conditional UPDATE, no-op if already verified
+                get_user_model().objects.filter(
+                    id=payload['user_id'],
+                    is_verified=False
+                ).update(is_verified=True, updated_at=timezone.now())
+                cache.set(consumed_key, True, settings.EMAIL_VERIFY_CACHE_TIMEOUT)
 
             return Response({'email': 'Successfully activated !'}, status=status.HTTP_200_OK)
         # in case token is expired
@@ -109,6 +196,8 @@ class LoginUserView(generics.GenericAPIView):
     Login user in to the system
     """
     serializer_class = LoginSerializer
+    throttle_classes = (IPRateThrottle, EmailRateThrottle)
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -117,36 +206,117 @@ class LoginUserView(generics.GenericAPIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(SparseFieldsViewMixin, generics.RetrieveUpdateAPIView):
     """
     Manage the authenticated user
     """
     serializer_class = UserSerializer
     permission_classes = (permissions.IsAuthenticated),
-
+    replica_safe = True
 
     def get_object(self):
         """
-        Retrieve and return authenticated user
+        Return authenticated user, it is already loaded by authentication
         """
-        # sending email verification if user updated email
-        user = get_object_or_404(get_user_model(), email=self.request.user.email)
-        if self.request.user.email != self.request.data.get('email') and self.request.data.get('email') != None:
-            email = Util.normalize_email(self.request.data.get('email'))
-            send_email_verify(user, self.request, email)
-            user.is_verified = False
-            user.save()
-
-        return user
+        return self.request.user
 
+    def get_etag(self, user, fields=None):
+        """
+        Validator of the profile, every change of the user moves updated_at
+        """
+        version = '{}:{}:{}'.format(
+            user.pk, user.updated_at.isoformat(), ','.join(fields or ())
+        )
+        return '"{}"'.format(hashlib.md5(version.encode()).hexdigest())
 
-class UserListViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return the profile from the cache, User.save and deleting
+        the user invalidate it. Polls with a matching If-None-Match or
+        If-Modified-Since get 304 from the user loaded by authentication,
+        without a query or the serializer.
+        """
+        fields = self.get_sparse_fields()
+        etag = self.get_etag(request.user, fields)
+        last_modified = int(request.user.updated_at.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = profile_cache_key(request.user.pk)
+            data = cache.get(key)
+            if data is None:
+                # the cache keeps every field, ?fields= trims after reading
+                serializer = self.get_serializer_class()(
+                    request.user, context=self.get_serializer_context()
+                )
+                data = dict(serializer.data)
+                cache.set(key, data, settings.PROFILE_CACHE_TIMEOUT)
+            if fields is not None:
+                data = {name: data[name] for name in fields if name in data}
+            response = Response(data)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # clients must revalidate, and the body differs per token
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', ))
+        return response
+
+    def perform_update(self, serializer):
+        """
+        Save the changes in one transaction, a changed email makes the user
+        unverified and the verification email is sent once it is committed
+        """
+        email = serializer.validated_data.get('email')
+        email_changed = (
+            email is not None
+            and Util.normalize_email(email) != serializer.instance.email
+        )
+        with transaction.atomic():
+            if email_changed:
+                user = serializer.save(is_verified=False)
+                transaction.on_commit(lambda: send_email_verify(user, self.request))
+            else:
+                serializer.save()
+
+
+class UserListViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """
     A simple ViewSet for viewing and editing accounts.
     """
     queryset =get_user_model().objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    replica_safe = True
+
+    @swagger_auto_schema(request_body=BulkUserActionSerializer)
+    @action(detail=False, methods=['post'], serializer_class=BulkUserActionSerializer)
+    def bulk(self, request):
+        """
+        Activate, deactivate, verify or resend verification to many users
+        with one query instead of one request per user
+        """
+        serializer = BulkUserActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        name = serializer.validated_data['action']
+        users = get_user_model().objects.filter(pk__in=serializer.validated_data['ids'])
+
+        if name == 'resend_verification':
+            count = emails.resend_email_verify(users, request)
+        else:
+            count = getattr(users, name)()
+
+        return Response({'action': name, 'count': count}, status=status.HTTP_200_OK)
+
+    def destroy(self, request, *args, **kwargs):
+        """
+        Deactivate the user at once, the account and its rows are removed
+        later in batches by the purge_users command
+        """
+        user = self.get_object()
+        request_deletion(get_user_model().objects.filter(pk=user.pk))
+        return Response(status=status.HTTP_202_ACCEPTED)
 
 
 class PasswordResetEmail(generics.GenericAPIView):
@@ -154,46 +324,33 @@ class PasswordResetEmail(generics.GenericAPIView):
     Password reset email for the user
     """
     serializer_class = ResetPasswordEmailSerializer
+    throttle_classes = (IPRateThrottle, EmailRateThrottle)
+    throttle_scope = 'password_reset'
 
     def post(self, request):
-
+        """
+        Answer the same way whether the email is registered or not,
+        so the response does not reveal which accounts exist
+        """
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        email = serializer.validated_data['email']
+        base_url = emails.get_base_url(request)
         try:
-
-            email = serializer.data.get('email')
             user = get_user_model().objects.get(email=email)
-            uidb64 = urlsafe_base64_encode(smart_bytes(user.id))
-            token = PasswordResetTokenGenerator().make_token(user)
-            current_site = get_current_site(request=request).domain
-            relative_link = reverse(
-                                'user:password-reset-confirm',
-                                kwargs={'uidb64': uidb64, 'token': token}
-                                )
+        except get_user_model().DoesNotExist:
+            user = None
 
-            abs_url = 'http://' + current_site + relative_link
+        if user is not None:
+            # token, templates and SMTP run in the background, both
+            # branches return equally fast
+            Util.queue_task(emails.send_password_reset, user, base_url)
 
-            email_body = "Hello, \n Use the link below to reset your password \n" + abs_url
-
-            data = {
-                'email_body': email_body,
-                'to_email': user.email,
-                'email_subject': 'Reset your password'
-            }
-            Util.send_email(data)
-
-            return Response(
-                        {'success': 'The link to reset your password was sent to email.'},
-                        status=status.HTTP_200_OK
-                        )
-
-        except Exception:
-
-            return Response(
-                        {'error': 'Provided email is not valid!'},
-                        status=status.HTTP_401_UNAUTHORIZED
-                        )
+        return Response(
+                    {'success': 'If the email is registered, the link to reset your password was sent to it.'},
+                    status=status.HTTP_200_OK
+                    )
 
 
 class PasswordTokenCheckApi(generics.GenericAPIView):
@@ -257,3 +414,10 @@ class LogOutAPIView(generics.GenericAPIView):
         serializer.save()
 
         return Response({'message': 'You have logged out successfully.'},status=status.HTTP_204_NO_CONTENT)
+
+
+class TokenRotateView(TokenViewBase):
+    """
+    Refresh access token, rotating the refresh token within its family
+    """
+    serializer_class = TokenRotateSerializer